@@ -7,17 +7,35 @@ Report Helper 启动脚本
 """
 
 import sys
-import os
+from pathlib import Path
 
 # 添加src目录到Python路径
-src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
-sys.path.insert(0, src_path)
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'src'))
+
+
+def run_with_profile(main_func, output_file: str = "report.prof"):
+    """在cProfile下运行主程序，退出时写入性能数据（可用 snakeviz 查看）"""
+    import cProfile
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        main_func()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_file)
+        print(f"性能数据已写入: {output_file}")
+
 
 # 导入并运行主程序
 if __name__ == "__main__":
     try:
         from src.main import main
-        main()
+        if "--profile" in sys.argv:
+            sys.argv.remove("--profile")
+            run_with_profile(main)
+        else:
+            main()
     except ImportError as e:
         print(f"导入错误: {e}")
         print("请确保所有依赖都已正确安装")
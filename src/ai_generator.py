@@ -5,13 +5,276 @@ AI报告生成模块
 集成多种大模型API进行智能报告生成，支持OpenAI、DeepSeek、智谱AI、百度文心一言、阿里通义千问等
 """
 
-import openai
+import asyncio
 import json
-from typing import List, Dict, Any, Optional, Union
-from datetime import datetime, timedelta
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
 import time
+import random
 import re
-import requests
+
+try:
+    # 可选依赖：orjson 编解码更快，未安装时退回标准库json
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    # openai/requests 导入开销较大，仅在真正调用API时才加载
+    import openai
+    import requests
+
+
+# 使用OpenAI兼容接口的提供商
+_OPENAI_COMPAT_SET = frozenset({"DeepSeek", "Doubao"})
+
+# 可重试的HTTP状态码（429单独按频率限制处理）
+_RETRIABLE_STATUS_CODES = frozenset({500, 502, 503, 529})
+
+# 单次调用最多尝试次数与总时限（秒）
+_MAX_RETRY_COUNT = 5
+_CALL_DEADLINE = 120
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """读取错误响应中的Retry-After头（秒），不存在或无法解析时返回None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        # HTTP日期格式的Retry-After较少见，退回默认退避
+        return None
+
+
+def _dumps_json(obj: Any) -> bytes:
+    """将请求体序列化为UTF-8编码的JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _loads_json(data: bytes) -> Any:
+    """解析响应体中的JSON"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 月报日志内容超过该字符数时，先按周摘要再生成
+_MONTHLY_SUMMARY_THRESHOLD = 8000
+
+# 默认系统提示词
+_DAILY_SYS_PROMPT = (
+    "你是一个专业的工作报告助手。请根据提供的工作日志生成简洁、专业的日报。"
+    "报告应包含：1. 今日完成的主要工作；2. 遇到的问题和解决方案；3. 明日工作计划。"
+    "语言要简洁明了，突出重点，避免冗余。"
+)
+_WEEKLY_SYS_PROMPT = (
+    "你是一个专业的工作报告助手。请根据提供的一周工作日志生成专业的周报。"
+    "报告应包含：1. 本周主要成果和完成的项目；2. 重要进展和里程碑；3. 遇到的挑战和解决方案；4. 下周工作重点。"
+    "请按重要性排序，突出关键成果。"
+)
+_MONTHLY_SYS_PROMPT = (
+    "你是一个专业的工作报告助手。请根据提供的一个月工作日志生成全面的月报。"
+    "报告应包含：1. 月度主要成果和完成的重要项目；2. 关键指标和数据；3. 重要里程碑和突破；"
+    "4. 遇到的主要挑战和解决方案；5. 经验总结和改进建议；6. 下月工作目标和计划。"
+    "请突出重点成果，提供数据支撑，体现工作价值。"
+)
+_CUSTOM_SYS_PROMPT = (
+    "你是一个专业的工作报告助手。请根据用户的具体要求和提供的工作日志生成报告。"
+    "确保报告内容准确、专业、符合用户需求。"
+)
+_SUMMARIZE_SYS_PROMPT = "你是一个工作日志整理助手，擅长从大量日志中提炼关键成果。"
+_ENHANCE_SYS_PROMPT = "你是一个专业的文档编辑助手，擅长优化和改进工作报告的质量。"
+
+# 报告增强类型对应的提示语（只读）
+_ENHANCEMENT_PROMPTS = MappingProxyType({
+    "polish": "请对以下工作报告进行润色，使其更加专业、简洁、有条理：",
+    "expand": "请对以下工作报告进行扩展，增加更多细节和分析：",
+    "summarize": "请对以下工作报告进行精简，提取核心要点：",
+    "format": "请对以下工作报告进行格式优化，使其结构更清晰："
+})
+
+
+def _build_messages(system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+    """构建 system + user 两条消息的对话"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+# 各提供商的特征域名/关键字，一次正则扫描找出URL中出现的全部关键字
+_PROVIDER_RE = re.compile(
+    r"(deepseek\.com|bigmodel\.cn|baidubce\.com|baidu|aliyuncs\.com|dashscope|volces\.com|doubao)",
+    re.IGNORECASE
+)
+# 关键字 -> 提供商，按识别优先级排列（URL含多个关键字时取优先级最高者）
+_MATCH_TO_PROVIDER = {
+    "deepseek.com": "DeepSeek",
+    "bigmodel.cn": "智谱AI",
+    "baidubce.com": "百度文心",
+    "baidu": "百度文心",
+    "aliyuncs.com": "阿里通义",
+    "dashscope": "阿里通义",
+    "volces.com": "Doubao",
+    "doubao": "Doubao",
+}
+
+
+@lru_cache(maxsize=64)
+def _week_of(date_str: str) -> int:
+    """返回 YYYY-MM-DD 日期所在的ISO周数（同一日期只解析一次）"""
+    return date.fromisoformat(date_str).isocalendar()[1]
+
+
+# 非OpenAI兼容服务商共享的HTTP会话池，按 (api_base, api_key摘要) 复用连接
+_http_sessions: Dict[Tuple[str, str], "requests.Session"] = {}
+_http_sessions_lock = threading.Lock()
+
+
+def _session_key(api_base: str, api_key: str) -> Tuple[str, str]:
+    """生成会话池的键，避免在内存中以明文作为键保存API密钥"""
+    return api_base or "", hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+def _get_http_session(api_base: str, api_key: str) -> "requests.Session":
+    """获取（或创建）共享的HTTP会话，保持长连接以复用TCP/TLS握手"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    key = _session_key(api_base, api_key)
+    with _http_sessions_lock:
+        session = _http_sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # 重试由 _call_openai_api 自行处理，这里不做传输层重试
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_sessions[key] = session
+        return session
+
+
+def close_http_sessions() -> None:
+    """关闭所有共享的HTTP会话（应用退出时调用）"""
+    with _http_sessions_lock:
+        sessions = list(_http_sessions.values())
+        _http_sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+# 最近一次连接测试成功的结果，键为 (provider, model, api_base, api_key摘要)
+_CONNECTION_STATUS_TTL = 60
+_connection_status: Dict[Tuple[str, ...], Tuple[float, Dict[str, Any]]] = {}
+
+
+# 共享的OpenAI客户端，按 (base_url, api_key摘要) 复用连接池
+_openai_clients: Dict[Tuple[str, str], "openai.OpenAI"] = {}
+_openai_clients_lock = threading.Lock()
+
+
+def _get_openai_client(api_key: str, base_url: Optional[str]) -> "openai.OpenAI":
+    """获取进程内共享的OpenAI客户端，相同 (api_key, base_url) 复用同一连接池
+    
+    注意：使用fork方式的多进程时，子进程需先调用 clear_openai_clients()，
+    避免与父进程共用已建立的连接。
+    """
+    key = _session_key(base_url, api_key)
+    with _openai_clients_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            import httpx
+            import openai
+            
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+            )
+            client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            _openai_clients[key] = client
+        return client
+
+
+def clear_openai_clients() -> None:
+    """清空共享的OpenAI客户端（AI配置更改后调用）
+    
+    已创建的生成器实例仍持有各自的客户端，不受影响；之后创建的实例按新配置获取客户端。
+    """
+    with _openai_clients_lock:
+        _openai_clients.clear()
+
+
+# 报告结果缓存：目录（固定在应用目录下，不随启动时的工作目录变化）、有效期（秒），
+# 以及默认启用缓存的温度上限（可通过AI配置的cache_max_temperature调整）
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CACHE_DIR = os.path.join(_APP_DIR, ".cache", "ai")
+_CACHE_TTL = 86400 * 7
+_CACHE_MAX_TEMPERATURE = 0.3
+
+
+class _ResponseCache:
+    """基于SQLite的报告结果缓存，按请求参数的内容摘要存取"""
+    
+    def __init__(self, directory: str = _CACHE_DIR):
+        self._path = os.path.join(directory, "responses.sqlite3")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """延迟打开数据库，首次使用时才创建缓存目录"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expire_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存结果，缓存不可用时返回None"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT value FROM responses WHERE key = ? AND expire_at > ?",
+                    (key, time.time())
+                ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            print(f"读取报告缓存失败: {e}")
+            return None
+        return row[0] if row else None
+    
+    def set(self, key: str, value: str, expire: float = _CACHE_TTL) -> None:
+        """写入缓存结果，并顺带清理已过期的条目"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses WHERE expire_at <= ?", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expire_at) VALUES (?, ?, ?)",
+                    (key, value, now + expire)
+                )
+                conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            print(f"写入报告缓存失败: {e}")
+
+
+_response_cache = _ResponseCache()
 
 
 class AIReportGenerator:
@@ -44,7 +307,8 @@ class AIReportGenerator:
     def __init__(self, api_config: Union[Dict[str, Any], str], 
                  api_base: str = None, model: str = None, 
                  temperature: float = 0.7, max_tokens: int = 1000, 
-                 timeout: int = 30, retry_count: int = 3):
+                 timeout: int = 30, retry_count: int = 3,
+                 cache_max_temperature: float = _CACHE_MAX_TEMPERATURE):
         
         # 处理不同的初始化方式
         if isinstance(api_config, dict):
@@ -66,6 +330,7 @@ class AIReportGenerator:
             self.timeout = api_config.get("timeout", timeout)
             self.retry_count = api_config.get("retry_count", retry_count)
             self.system_prompt = api_config.get("system_prompt", "")
+            self.cache_max_temperature = api_config.get("cache_max_temperature", cache_max_temperature)
         else:
             # 从参数初始化
             self.api_key = api_config  # api_config作为api_key
@@ -77,34 +342,59 @@ class AIReportGenerator:
             self.timeout = timeout
             self.retry_count = retry_count
             self.system_prompt = ""
+            self.cache_max_temperature = cache_max_temperature
+        
+        # 限制总尝试次数，避免配置过大时长时间阻塞
+        self.retry_count = max(1, min(int(self.retry_count), _MAX_RETRY_COUNT))
+        
+        # 提供商在构造后不再变化，是否兼容OpenAI只需判断一次
+        self._openai_compat = self.provider in _OPENAI_COMPAT_SET
+        
+        # 按提供商绑定调用方式，重试循环中无需再逐个判断
+        self._invoke = {
+            "DeepSeek": self._invoke_openai,
+            "Doubao": self._invoke_openai,
+            "智谱AI": self._invoke_zhipu,
+            "百度文心": self._invoke_baidu,
+            "阿里通义": self._invoke_ali
+        }.get(self.provider, self._invoke_openai)
         
         # 配置OpenAI客户端（用于OpenAI和兼容OpenAI API的模型）
-        if self._is_openai_compatible():
+        if self._openai_compat:
             # 使用新版OpenAI客户端
-            self.client = openai.OpenAI(
-                api_key=self.api_key,
-                base_url=self.api_base if self.api_base and self.api_base != "https://api.openai.com/v1" else None
-            )
+            self.client = _get_openai_client(self.api_key, self._openai_base_url())
+        else:
+            # 其他服务商通过requests直接调用，复用共享会话
+            self._session = _get_http_session(self.api_base, self.api_key)
+    
+    def close(self) -> None:
+        """关闭当前配置对应的共享HTTP会话
+        
+        会话在相同 (api_base, api_key) 的生成器实例之间共享，关闭后下次调用会自动重建。
+        """
+        session = getattr(self, "_session", None)
+        if session is None:
+            return
+        key = _session_key(self.api_base, self.api_key)
+        with _http_sessions_lock:
+            if _http_sessions.get(key) is session:
+                del _http_sessions[key]
+        session.close()
+        self._session = None
+    
+    def _get_session(self) -> "requests.Session":
+        """获取HTTP会话，已关闭时重新从会话池获取"""
+        if getattr(self, "_session", None) is None:
+            self._session = _get_http_session(self.api_base, self.api_key)
+        return self._session
     
     def _detect_provider(self, api_base: str) -> str:
         """根据API基础URL检测提供商"""
-        if not api_base:
-            return "DeepSeek"
-            
-        api_base_lower = api_base.lower()
-        
-        # 精确匹配各个提供商的特征域名
-        if "deepseek.com" in api_base_lower:
-            return "DeepSeek"
-        elif "bigmodel.cn" in api_base_lower:
-            return "智谱AI"
-        elif "baidubce.com" in api_base_lower or "baidu" in api_base_lower:
-            return "百度文心"
-        elif "aliyuncs.com" in api_base_lower or "dashscope" in api_base_lower:
-            return "阿里通义"
-        elif "volces.com" in api_base_lower or "doubao" in api_base_lower:
-            return "Doubao"
-        
+        found = {token.lower() for token in _PROVIDER_RE.findall(api_base or "")}
+        if found:
+            for token, provider in _MATCH_TO_PROVIDER.items():
+                if token in found:
+                    return provider
         return "DeepSeek"  # 默认为DeepSeek
     
     def _get_default_model(self, provider: str) -> str:
@@ -115,131 +405,313 @@ class AIReportGenerator:
     
     def _is_openai_compatible(self) -> bool:
         """检查是否使用OpenAI兼容的API"""
-        return self.provider in ["DeepSeek", "Doubao"]
+        return self._openai_compat
+    
+    def _openai_base_url(self) -> Optional[str]:
+        """OpenAI客户端使用的base_url，官方地址时返回None使用默认值"""
+        if self.api_base and self.api_base != "https://api.openai.com/v1":
+            return self.api_base
+        return None
     
-    def _call_openai_api(self, messages: List[Dict[str, str]]) -> Optional[str]:
-        """调用大模型API"""
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        """根据模型参数与消息内容生成缓存键
+        
+        逐段写入摘要而不拼接整段JSON，避免长月报提示词产生额外的大块内存拷贝。
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update((self.api_base or "").encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(self.model.encode("utf-8"))
+        h.update(struct.pack("<di", float(self.temperature), int(self.max_tokens)))
+        for message in messages:
+            h.update(message["role"].encode("utf-8"))
+            h.update(b"\x1f")
+            h.update(message["content"].encode("utf-8"))
+            h.update(b"\x1e")
+        return h.hexdigest()
+    
+    def _should_cache(self, use_cache: Optional[bool]) -> bool:
+        """未显式指定时，仅在温度低于cache_max_temperature（输出较确定）时启用缓存
+        
+        默认上限0.3低于默认温度0.7，即默认配置下不缓存；需要缓存时可调高该上限。
+        """
+        if use_cache is not None:
+            return use_cache
+        return self.temperature < self.cache_max_temperature
+    
+    def _call_openai_api(self, messages: List[Dict[str, str]],
+                         use_cache: Optional[bool] = None) -> Optional[str]:
+        """调用大模型API，相同请求命中缓存时直接返回上次结果"""
+        if not self._should_cache(use_cache):
+            return self._request_completion(messages)
+        
+        key = self._cache_key(messages)
+        cached = _response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = self._request_completion(messages)
+        if result:
+            _response_cache.set(key, result)
+        return result
+    
+    def _request_completion(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """实际发起大模型API请求（含重试）"""
+        deadline = time.monotonic() + _CALL_DEADLINE
         for attempt in range(self.retry_count):
             try:
-                # 根据提供商选择不同的调用方式
-                if self._is_openai_compatible():
-                    # 使用OpenAI兼容的API调用（新版客户端）
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=messages,
-                        temperature=self.temperature,
-                        max_tokens=self.max_tokens,
-                        timeout=self.timeout
-                    )
-                    return response.choices[0].message.content.strip()
-                
-                elif self.provider == "智谱AI":
-                    # 智谱AI API调用
-                    headers = {"Authorization": f"Bearer {self.api_key}"}
-                    payload = {
-                        "model": self.model,
-                        "messages": messages,
-                        "temperature": self.temperature,
-                        "max_tokens": self.max_tokens
-                    }
-                    response = requests.post(self.api_base, headers=headers, json=payload, timeout=self.timeout)
-                    response.raise_for_status()
-                    return response.json()["choices"][0]["message"]["content"]
-                
-                elif self.provider == "百度文心":
-                    # 百度文心API调用
-                    headers = {"Content-Type": "application/json"}
-                    payload = {
-                        "messages": messages,
-                        "temperature": self.temperature,
-                        "token_limit": self.max_tokens
-                    }
-                    url = f"{self.api_base}/{self.model}?access_token={self.api_key}"
-                    response = requests.post(url, headers=headers, json=payload, timeout=self.timeout)
-                    response.raise_for_status()
-                    return response.json()["result"]
-                
-                elif self.provider == "阿里通义":
-                    # 阿里通义千问API调用
-                    headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-                    payload = {
-                        "model": self.model,
-                        "input": {"messages": messages},
-                        "parameters": {
-                            "temperature": self.temperature,
-                            "max_tokens": self.max_tokens
-                        }
-                    }
-                    response = requests.post(f"{self.api_base}/generation", headers=headers, json=payload, timeout=self.timeout)
-                    response.raise_for_status()
-                    return response.json()["output"]["text"]
-                
-                elif self.provider == "讯飞星火":
-                    # 讯飞星火API调用
-                    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
-                    payload = {
-                        "header": {"app_id": self.api_key.split(".")[0]},
-                        "parameter": {
-                            "chat": {
-                                "domain": self.model,
-                                "temperature": self.temperature,
-                                "max_tokens": self.max_tokens
-                            }
-                        },
-                        "payload": {"message": {"text": messages}}
-                    }
-                    response = requests.post(self.api_base, headers=headers, json=payload, timeout=self.timeout)
-                    response.raise_for_status()
-                    return response.json()["payload"]["text"]["content"]
-                
-                else:
-                    # 默认使用OpenAI兼容的API调用（新版客户端）
-                    # 确保客户端已初始化
-                    if not hasattr(self, 'client'):
-                        self.client = openai.OpenAI(
-                            api_key=self.api_key,
-                            base_url=self.api_base
-                        )
-                    
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=messages,
-                        temperature=self.temperature,
-                        max_tokens=self.max_tokens,
-                        timeout=self.timeout
-                    )
-                    return response.choices[0].message.content.strip()
-            
+                return self._invoke(messages)
             except Exception as e:
-                 # 处理不同类型的错误
-                 if "rate limit" in str(e).lower():
-                     # 处理频率限制错误
-                     if attempt < self.retry_count - 1:
-                         wait_time = (2 ** attempt) * 2  # 指数退避
-                         print(f"API调用频率限制，等待{wait_time}秒后重试...")
-                         time.sleep(wait_time)
-                     else:
-                         print("API调用频率限制，已达到最大重试次数")
-                         return None
-                 elif "api" in str(e).lower() and "error" in str(e).lower():
-                     # 处理API错误
-                     print(f"API错误: {e}")
-                     if attempt < self.retry_count - 1:
-                         time.sleep(1)
-                     else:
-                         return None
-                 else:
-                     # 处理其他异常
-                     print(f"API调用异常: {e}")
-                     if attempt < self.retry_count - 1:
-                         time.sleep(1)
-                     else:
-                         return None
+                wait_time = self._retry_delay(e, attempt, deadline)
+                if wait_time is None:
+                    return None
+                time.sleep(wait_time)
         
         return None
     
+    def _invoke_openai(self, messages: List[Dict[str, str]]) -> str:
+        """OpenAI兼容的API调用（新版客户端），未知提供商也走此路径"""
+        if getattr(self, "client", None) is None:
+            self.client = _get_openai_client(self.api_key, self._openai_base_url())
+        
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            timeout=self.timeout
+        )
+        return response.choices[0].message.content.strip()
+    
+    def _invoke_zhipu(self, messages: List[Dict[str, str]]) -> str:
+        """智谱AI API调用"""
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        response = self._get_session().post(self.api_base, headers=headers, data=_dumps_json(payload), timeout=self.timeout)
+        response.raise_for_status()
+        return _loads_json(response.content)["choices"][0]["message"]["content"]
+    
+    def _invoke_baidu(self, messages: List[Dict[str, str]]) -> str:
+        """百度文心API调用"""
+        headers = {"Content-Type": "application/json"}
+        payload = {
+            "messages": messages,
+            "temperature": self.temperature,
+            "token_limit": self.max_tokens
+        }
+        url = f"{self.api_base}/{self.model}?access_token={self.api_key}"
+        response = self._get_session().post(url, headers=headers, data=_dumps_json(payload), timeout=self.timeout)
+        response.raise_for_status()
+        return _loads_json(response.content)["result"]
+    
+    def _invoke_ali(self, messages: List[Dict[str, str]]) -> str:
+        """阿里通义千问API调用"""
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": self.model,
+            "input": {"messages": messages},
+            "parameters": {
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens
+            }
+        }
+        response = self._get_session().post(f"{self.api_base}/generation", headers=headers, data=_dumps_json(payload), timeout=self.timeout)
+        response.raise_for_status()
+        return _loads_json(response.content)["output"]["text"]
+    
+    def stream_generate(self, messages: List[Dict[str, str]],
+                        use_cache: Optional[bool] = None) -> Iterator[str]:
+        """流式调用大模型API，逐段返回生成的文本
+        
+        非OpenAI兼容的服务商不支持流式输出，退回阻塞调用并一次性返回完整结果。
+        """
+        if not self._openai_compat:
+            result = self._call_openai_api(messages, use_cache)
+            if result:
+                yield result
+            return
+        
+        key = self._cache_key(messages) if self._should_cache(use_cache) else None
+        if key is not None:
+            cached = _response_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        try:
+            with self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                timeout=self.timeout,
+                stream=True
+            ) as stream:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            # 已输出部分内容后无法透明重试，直接结束流
+            print(f"API流式调用异常: {e}")
+            return
+        
+        if key is not None and parts:
+            _response_cache.set(key, "".join(parts).strip())
+    
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """根据异常类型决定重试前的等待秒数，返回None表示放弃重试"""
+        wait_time = self._classify_error(error, attempt)
+        if wait_time is not None and time.monotonic() + wait_time > deadline:
+            print(f"API调用已超过{_CALL_DEADLINE}秒总时限，放弃重试")
+            return None
+        return wait_time
+    
+    def _classify_error(self, error: Exception, attempt: int) -> Optional[float]:
+        """按异常类型计算等待秒数，返回None表示不可重试"""
+        import openai
+        import requests
+        
+        is_last_attempt = attempt >= self.retry_count - 1
+        
+        status_code = None
+        if isinstance(error, openai.APIStatusError):
+            status_code = error.status_code
+        elif isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+        
+        if status_code == 429:
+            # 处理频率限制错误
+            if is_last_attempt:
+                print("API调用频率限制，已达到最大重试次数")
+                return None
+            # 优先遵循服务端给出的Retry-After，否则使用带抖动的退避
+            wait_time = _retry_after_seconds(error)
+            if wait_time is None:
+                wait_time = random.uniform(2, 4) * (attempt + 1)
+            print(f"API调用频率限制，等待{wait_time:.1f}秒后重试...")
+            return wait_time
+        
+        if status_code is not None:
+            # 处理API错误，仅服务端临时故障值得重试
+            print(f"API错误({status_code}): {error}")
+            if status_code not in _RETRIABLE_STATUS_CODES or is_last_attempt:
+                return None
+            return 1
+        
+        if isinstance(error, (openai.APITimeoutError, requests.exceptions.Timeout)):
+            print(f"API请求超时: {error}")
+            return None if is_last_attempt else 0
+        
+        if isinstance(error, (openai.APIConnectionError, requests.exceptions.RequestException)):
+            print(f"API连接异常: {error}")
+            return None if is_last_attempt else 1
+        
+        # 其他异常（如响应格式不符）重试也无济于事
+        print(f"API调用异常: {error}")
+        return None
+    
+    async def _acall_openai_api(self, messages: List[Dict[str, str]],
+                                aclient: Optional["openai.AsyncOpenAI"] = None) -> Optional[str]:
+        """异步调用大模型API，与 _call_openai_api 的重试逻辑保持一致"""
+        if aclient is None:
+            # 非OpenAI兼容的服务商没有异步客户端，放到线程池中执行同步调用
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._call_openai_api, messages)
+        
+        key = self._cache_key(messages) if self._should_cache(None) else None
+        if key is not None:
+            cached = _response_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        deadline = time.monotonic() + _CALL_DEADLINE
+        for attempt in range(self.retry_count):
+            try:
+                response = await aclient.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    timeout=self.timeout
+                )
+                result = response.choices[0].message.content.strip()
+                if key is not None and result:
+                    _response_cache.set(key, result)
+                return result
+            except Exception as e:
+                wait_time = self._retry_delay(e, attempt, deadline)
+                if wait_time is None:
+                    return None
+                await asyncio.sleep(wait_time)
+        
+        return None
+    
+    async def agenerate_many(self, jobs: List[Tuple[str, List[Dict]]]) -> List[Optional[str]]:
+        """并发生成多份报告
+        
+        Args:
+            jobs: (report_type, work_logs) 列表，report_type 为 daily/weekly/monthly
+            
+        Returns:
+            与 jobs 顺序一致的报告内容列表，生成失败的位置为None
+        """
+        builders = {
+            "daily": self._build_daily_messages,
+            "weekly": self._build_weekly_messages,
+            "monthly": self._build_monthly_messages
+        }
+        message_lists = [
+            builders.get(report_type, self._build_daily_messages)(work_logs)
+            for report_type, work_logs in jobs
+        ]
+        
+        # AsyncClient绑定在当前事件循环上，因此每批任务单独创建并在结束时关闭
+        aclient = None
+        if self._openai_compat:
+            import httpx
+            import openai
+            
+            aclient = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self._openai_base_url(),
+                http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=32))
+            )
+        # 限制同时进行的请求数，避免httpx连接池在高并发下排队超时
+        semaphore = asyncio.Semaphore(16)
+        
+        async def run(messages: Optional[List[Dict[str, str]]]) -> Optional[str]:
+            if messages is None:
+                return None
+            async with semaphore:
+                return await self._acall_openai_api(messages, aclient)
+        
+        try:
+            return await asyncio.gather(*(run(messages) for messages in message_lists))
+        finally:
+            if aclient is not None:
+                await aclient.close()
+    
+    def generate_many(self, jobs: List[Tuple[str, List[Dict]]]) -> List[Optional[str]]:
+        """并发生成多份报告（同步入口），总耗时取决于最慢的一次调用"""
+        return asyncio.run(self.agenerate_many(jobs))
+    
     def test_connection(self) -> Dict[str, Any]:
-        """测试API连接"""
+        """测试API连接，60秒内成功过的相同配置直接返回上次结果"""
+        status_key = (self.provider, self.model) + _session_key(self.api_base, self.api_key)
+        cached = _connection_status.get(status_key)
+        if cached and time.monotonic() - cached[0] < _CONNECTION_STATUS_TTL:
+            return dict(cached[1])
+        
         try:
             # 简单的测试消息
             messages = [
@@ -248,138 +720,186 @@ class AIReportGenerator:
             ]
             
             # 调用API
-            response = self._call_openai_api(messages)
+            response = self._call_openai_api(messages, use_cache=False)
             
             if response:
-                return {
+                preview = response[:50] + "..." if len(response) > 50 else response
+                result = {
                     "success": True,
                     "message": f"{self.provider} API连接成功！模型: {self.model}",
                     "provider": self.provider,
                     "model": self.model,
-                    "response": response[:50] + "..." if len(response) > 50 else response
+                    "response": preview,
+                    "details": {"model": self.model, "response": preview}
                 }
+                _connection_status[status_key] = (time.monotonic(), result)
+                return dict(result)
             else:
                 return {
                     "success": False,
                     "message": f"{self.provider} API连接失败，请检查API密钥和网络连接。",
                     "provider": self.provider,
-                    "model": self.model
+                    "model": self.model,
+                    "details": {}
                 }
         except Exception as e:
             return {
                 "success": False,
                 "message": f"{self.provider} API连接测试异常: {str(e)}",
                 "provider": self.provider,
-                "model": self.model
+                "model": self.model,
+                "details": {}
             }
     
     def generate_daily_report(self, work_logs: List[Dict], system_prompt: str = None) -> Optional[str]:
         """生成日报"""
+        messages = self._build_daily_messages(work_logs, system_prompt)
+        if messages is None:
+            return None
+        return self._call_openai_api(messages)
+    
+    def generate_daily_report_stream(self, work_logs: List[Dict],
+                                     system_prompt: str = None) -> Iterator[str]:
+        """流式生成日报，逐段返回内容"""
+        messages = self._build_daily_messages(work_logs, system_prompt)
+        if messages is None:
+            return iter(())
+        return self.stream_generate(messages)
+    
+    def _build_daily_messages(self, work_logs: List[Dict],
+                              system_prompt: str = None) -> Optional[List[Dict[str, str]]]:
+        """构建日报的对话消息"""
         if not work_logs:
             return None
         
-        # 默认系统提示词
-        if not system_prompt:
-            system_prompt = (
-                "你是一个专业的工作报告助手。请根据提供的工作日志生成简洁、专业的日报。"
-                "报告应包含：1. 今日完成的主要工作；2. 遇到的问题和解决方案；3. 明日工作计划。"
-                "语言要简洁明了，突出重点，避免冗余。"
-            )
+        system_prompt = system_prompt or _DAILY_SYS_PROMPT
         
         # 整理工作日志
         log_content = "\n".join([
             f"- {log.get('content', '')} (类型: {log.get('type', '工作')}, 优先级: {log.get('priority', '中')}, 标签: {log.get('tags', [])})"
-            for log in work_logs
+            for log in self._dedup_logs(work_logs)
         ])
         
         user_prompt = f"请根据以下工作日志生成今日工作日报：\n\n{log_content}"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        return self._call_openai_api(messages)
+        return _build_messages(system_prompt, user_prompt)
+    
+    @staticmethod
+    def _dedup_logs(work_logs: List[Dict]) -> List[Dict]:
+        """按 (内容, 日期, 类型) 去除重复日志，保留首次出现的顺序"""
+        seen = set()
+        unique_logs = []
+        for log in work_logs:
+            # 直接以内容本身为键（集合只保存引用），避免哈希碰撞误删不同日志
+            key = (log.get('content'), log.get('date'), log.get('type'))
+            if key not in seen:
+                seen.add(key)
+                unique_logs.append(log)
+        return unique_logs
+    
+    @staticmethod
+    def _format_log_line(log: Dict) -> str:
+        """格式化周报/月报中的单条日志"""
+        get = log.get
+        return f"  - {get('content', '')} (类型: {get('type', '工作')}, 优先级: {get('priority', '中')})"
     
     def generate_weekly_report(self, work_logs: List[Dict], system_prompt: str = None) -> Optional[str]:
         """生成周报"""
+        messages = self._build_weekly_messages(work_logs, system_prompt)
+        if messages is None:
+            return None
+        return self._call_openai_api(messages)
+    
+    def _build_weekly_messages(self, work_logs: List[Dict],
+                               system_prompt: str = None) -> Optional[List[Dict[str, str]]]:
+        """构建周报的对话消息"""
         if not work_logs:
             return None
         
-        if not system_prompt:
-            system_prompt = (
-                "你是一个专业的工作报告助手。请根据提供的一周工作日志生成专业的周报。"
-                "报告应包含：1. 本周主要成果和完成的项目；2. 重要进展和里程碑；3. 遇到的挑战和解决方案；4. 下周工作重点。"
-                "请按重要性排序，突出关键成果。"
-            )
+        system_prompt = system_prompt or _WEEKLY_SYS_PROMPT
         
-        # 按日期分组整理日志
+        # 按日期分组整理日志（一次遍历，缺省日期只计算一次）
+        today = datetime.now().strftime('%Y-%m-%d')
         logs_by_date = {}
-        for log in work_logs:
-            date = log.get('date', datetime.now().strftime('%Y-%m-%d'))
-            if date not in logs_by_date:
-                logs_by_date[date] = []
-            logs_by_date[date].append(log)
+        for log in self._dedup_logs(work_logs):
+            logs_by_date.setdefault(log.get('date', today), []).append(log)
         
-        log_content = ""
+        parts = []
         for date, daily_logs in sorted(logs_by_date.items()):
-            log_content += f"\n{date}:\n"
-            for log in daily_logs:
-                log_content += f"  - {log.get('content', '')} (类型: {log.get('type', '工作')}, 优先级: {log.get('priority', '中')})\n"
+            parts.append(f"\n{date}:")
+            parts.extend(self._format_log_line(log) for log in daily_logs)
+        log_content = "\n".join(parts)
         
         user_prompt = f"请根据以下一周的工作日志生成周报：\n{log_content}"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        return self._call_openai_api(messages)
+        return _build_messages(system_prompt, user_prompt)
     
     def generate_monthly_report(self, work_logs: List[Dict], system_prompt: str = None) -> Optional[str]:
         """生成月报"""
+        messages = self._build_monthly_messages(work_logs, system_prompt, summarize=True)
+        if messages is None:
+            return None
+        return self._call_openai_api(messages)
+    
+    def _build_monthly_messages(self, work_logs: List[Dict], system_prompt: str = None,
+                                summarize: bool = False) -> Optional[List[Dict[str, str]]]:
+        """构建月报的对话消息，summarize为True且日志过长时先按周摘要"""
         if not work_logs:
             return None
         
-        if not system_prompt:
-            system_prompt = (
-                "你是一个专业的工作报告助手。请根据提供的一个月工作日志生成全面的月报。"
-                "报告应包含：1. 月度主要成果和完成的重要项目；2. 关键指标和数据；3. 重要里程碑和突破；"
-                "4. 遇到的主要挑战和解决方案；5. 经验总结和改进建议；6. 下月工作目标和计划。"
-                "请突出重点成果，提供数据支撑，体现工作价值。"
-            )
+        system_prompt = system_prompt or _MONTHLY_SYS_PROMPT
         
         # 按周分组整理日志
+        today = datetime.now().strftime('%Y-%m-%d')
         logs_by_week = {}
-        for log in work_logs:
-            date_str = log.get('date', datetime.now().strftime('%Y-%m-%d'))
+        for log in self._dedup_logs(work_logs):
             try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                week_num = date_obj.isocalendar()[1]
-                week_key = f"第{week_num}周"
-                if week_key not in logs_by_week:
-                    logs_by_week[week_key] = []
-                logs_by_week[week_key].append(log)
-            except:
+                week_num = _week_of(log.get('date', today))
+            except (TypeError, ValueError):
                 # 如果日期解析失败，放入其他分类
-                if "其他" not in logs_by_week:
-                    logs_by_week["其他"] = []
-                logs_by_week["其他"].append(log)
+                week_key = "其他"
+            else:
+                week_key = f"第{week_num}周"
+            logs_by_week.setdefault(week_key, []).append(log)
         
-        log_content = ""
+        parts = []
         for week, weekly_logs in logs_by_week.items():
-            log_content += f"\n{week}：\n"
-            for log in weekly_logs:
-                log_content += f"  - {log.get('content', '')} (类型: {log.get('type', '工作')}, 优先级: {log.get('priority', '中')})\n"
+            parts.append(f"\n{week}：")
+            parts.extend(self._format_log_line(log) for log in weekly_logs)
+        log_content = "\n".join(parts)
+        
+        if summarize and len(log_content) > _MONTHLY_SUMMARY_THRESHOLD:
+            # 日志过长时先逐周提炼要点，再用摘要生成月报，控制提示词长度
+            parts = []
+            for week, weekly_logs in logs_by_week.items():
+                summary = self._summarize_bucket(weekly_logs)
+                parts.append(f"\n{week}：")
+                if summary:
+                    parts.append(summary)
+                else:
+                    parts.extend(self._format_log_line(log) for log in weekly_logs)
+            log_content = "\n".join(parts)
         
         user_prompt = f"请根据以下一个月的工作日志生成月报：\n{log_content}"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        return self._call_openai_api(messages)
+        return _build_messages(system_prompt, user_prompt)
+    
+    def _summarize_bucket(self, logs: List[Dict], max_tokens: int = 200) -> Optional[str]:
+        """将一组日志提炼为3条要点，用于长周期报告的预摘要"""
+        # 低温度、小输出的独立生成器，与当前实例共享连接池，结果自动进入缓存
+        summarizer = AIReportGenerator({
+            "api_key": self.api_key,
+            "provider": self.provider,
+            "api_base_url": self.api_base,
+            "model": self.model,
+            "temperature": 0.2,
+            "max_tokens": max_tokens,
+            "timeout": self.timeout,
+            "retry_count": self.retry_count
+        })
+        log_content = "\n".join(self._format_log_line(log) for log in logs)
+        user_prompt = f"请从以下工作日志中提炼3条关键成果，每条一行，以“- ”开头：\n{log_content}"
+        return summarizer._call_openai_api(_build_messages(_SUMMARIZE_SYS_PROMPT, user_prompt))
     
     def generate_custom_report(self, work_logs: List[Dict], custom_prompt: str, 
                              system_prompt: str = None) -> Optional[str]:
@@ -387,26 +907,17 @@ class AIReportGenerator:
         if not work_logs or not custom_prompt:
             return None
         
-        if not system_prompt:
-            system_prompt = (
-                "你是一个专业的工作报告助手。请根据用户的具体要求和提供的工作日志生成报告。"
-                "确保报告内容准确、专业、符合用户需求。"
-            )
+        system_prompt = system_prompt or _CUSTOM_SYS_PROMPT
         
         # 整理工作日志
         log_content = "\n".join([
             f"- {log.get('content', '')} (日期: {log.get('date', '')}, 类型: {log.get('type', '工作')}, 优先级: {log.get('priority', '中')})"
-            for log in work_logs
+            for log in self._dedup_logs(work_logs)
         ])
         
         user_prompt = f"{custom_prompt}\n\n工作日志：\n{log_content}"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        return self._call_openai_api(messages)
+        return self._call_openai_api(_build_messages(system_prompt, user_prompt))
     
     def generate_smart_report(self, work_logs: List[Dict], report_type: str = "daily") -> Optional[str]:
         """智能补报 - 自动生成报告"""
@@ -434,52 +945,10 @@ class AIReportGenerator:
         if not original_report:
             return None
         
-        enhancement_prompts = {
-            "polish": "请对以下工作报告进行润色，使其更加专业、简洁、有条理：",
-            "expand": "请对以下工作报告进行扩展，增加更多细节和分析：",
-            "summarize": "请对以下工作报告进行精简，提取核心要点：",
-            "format": "请对以下工作报告进行格式优化，使其结构更清晰："
-        }
-        
-        system_prompt = "你是一个专业的文档编辑助手，擅长优化和改进工作报告的质量。"
-        user_prompt = f"{enhancement_prompts.get(enhancement_type, enhancement_prompts['polish'])}\n\n{original_report}"
+        instruction = _ENHANCEMENT_PROMPTS.get(enhancement_type, _ENHANCEMENT_PROMPTS["polish"])
+        user_prompt = f"{instruction}\n\n{original_report}"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        return self._call_openai_api(messages)
-    
-    def test_connection(self) -> Dict[str, Any]:
-        """测试AI服务连接"""
-        result = {
-            "success": False,
-            "message": "",
-            "details": {}
-        }
-        
-        try:
-            # 发送一个简单的测试请求
-            messages = [
-                {"role": "system", "content": "你是一个测试助手。"},
-                {"role": "user", "content": "请回复'连接测试成功'"}
-            ]
-            
-            response = self._call_openai_api(messages)
-            
-            if response:
-                result["success"] = True
-                result["message"] = "AI服务连接测试成功"
-                result["details"]["model"] = self.model
-                result["details"]["response"] = response[:50] + "..." if len(response) > 50 else response
-            else:
-                result["message"] = "AI服务连接失败，请检查API配置"
-        
-        except Exception as e:
-            result["message"] = f"连接测试异常: {str(e)}"
-        
-        return result
+        return self._call_openai_api(_build_messages(_ENHANCE_SYS_PROMPT, user_prompt))
 
 
 def test_ai_connection(api_key: str, api_base: str = "https://api.deepseek.com/v1", 
@@ -5,168 +5,547 @@
 负责处理应用程序的配置文件读写和数据管理
 """
 
+import atexit
 import json
+import logging
 import os
+import shutil
+import threading
+import weakref
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from functools import cached_property
+from typing import Dict, List, Any, Optional, Union
+
+try:
+    # 可选依赖：orjson 直接输出UTF-8字节且编解码更快，未安装时退回标准库json
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+# 连续修改合并为一次写盘的时间窗口（秒）
+_SAVE_DELAY = 0.5
+
+# 现存的配置管理器，退出时统一写入尚未落盘的修改（弱引用，不延长实例生命周期）
+_instances = weakref.WeakSet()
+
+
+def _flush_all() -> None:
+    """写入所有配置管理器尚未保存的修改"""
+    for manager in list(_instances):
+        manager.flush()
+
+
+atexit.register(_flush_all)
+
+# 工作日志与报告历史单独保存为追加式JSONL日志，新增记录无需重写整个配置；
+# 日志文件与配置文件同目录，以配置文件名为前缀（如 config.work_logs.jsonl），同目录下的多个配置互不干扰
+_JOURNAL_FILES = {
+    "work_logs": "work_logs.jsonl",
+    "report_history": "report_history.jsonl"
+}
+
+# 日志文件中的失效行（被覆盖或已删除）超过该数量且多于有效记录时压缩重写
+_JOURNAL_COMPACT_MIN = 100
+# 以cached_property暴露的配置分区，整体替换配置时需失效
+_CACHED_SECTIONS = ("settings", "feishu_config", "ai_config")
+
+
+def _dumps_config(data: Any) -> bytes:
+    """将配置序列化为缩进两格的UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _dumps_record(data: Any) -> bytes:
+    """将单条记录序列化为紧凑的一行JSON"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _loads_config(data: Any) -> Any:
+    """解析配置文件内容"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 默认配置，预先序列化后每次反序列化得到一份深拷贝
+_DEFAULT_CONFIG: Dict[str, Any] = {
+    "work_logs": [],
+    "templates": {
+        "daily": "今日工作总结：\n\n完成事项：\n{completed_tasks}\n\n进行中事项：\n{ongoing_tasks}\n\n明日计划：\n{tomorrow_plan}",
+        "weekly": "本周工作总结：\n\n主要成果：\n{achievements}\n\n完成项目：\n{completed_projects}\n\n下周计划：\n{next_week_plan}",
+        "monthly": "本月工作总结：\n\n月度成果：\n{monthly_achievements}\n\n重要里程碑：\n{milestones}\n\n下月目标：\n{next_month_goals}"
+    },
+    "settings": {
+        "reminder_enabled": True,
+        "reminder_interval": 60,  # 分钟
+        "work_days": ["周一", "周二", "周三", "周四", "周五"],
+        "work_start_time": "09:00",
+        "work_end_time": "18:00",
+        "auto_submit_time": "20:00",
+        "startup_with_system": False,
+        "minimize_to_tray": True,
+        "show_notifications": True
+    },
+    "feishu_config": {
+        "enabled": False,
+        "app_id": "",
+        "app_secret": "",
+        "chat_id": "",
+        "auto_report_enabled": False,
+        "check_interval": 30,
+        "daily_advance_hours": 2,
+        "weekly_submit_time": "20:00",
+        "monthly_submit_time": "20:00"
+    },
+    "ai_config": {
+        "enabled": False,
+        "provider": "DeepSeek",
+        "api_key": "",
+        "api_base_url": "https://api.deepseek.com/v1",
+        "model": "deepseek-chat",
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "timeout": 30,
+        "retry_count": 3,
+        # 温度低于该值时缓存AI生成结果（默认温度0.7不缓存）
+        "cache_max_temperature": 0.3,
+        "system_prompt": "你是一个专业的工作报告助手，请根据提供的工作日志生成简洁、专业的工作报告。"
+    },
+    "ai_providers_config": {
+        "DeepSeek": {
+            "api_key": "",
+            "api_base_url": "https://api.deepseek.com/v1",
+            "model": "deepseek-chat"
+        },
+        "智谱AI": {
+            "api_key": "",
+            "api_base_url": "https://open.bigmodel.cn/api/paas/v4",
+            "model": "glm-4"
+        },
+        "百度文心": {
+            "api_key": "",
+            "api_base_url": "https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat",
+            "model": "ernie-bot-turbo"
+        },
+        "阿里通义": {
+            "api_key": "",
+            "api_base_url": "https://dashscope.aliyuncs.com/api/v1",
+            "model": "qwen-turbo"
+        },
+        "Doubao": {
+            "api_key": "",
+            "api_base_url": "https://ark.cn-beijing.volces.com/api/v3",
+            "model": "doubao-lite-4k"
+        }
+    },
+    "report_history": [],
+    "submit_status": {
+        "last_submit_date": "",
+        "auto_submit_enabled": True,
+        "submit_count": 0
+    }
+}
+_DEFAULT_CONFIG_BYTES = _dumps_record(_DEFAULT_CONFIG)
+
+
+def _apply_updates(target: Dict[str, Any], updates: Dict[str, Any]) -> bool:
+    """只写入值有变化的字段，返回是否有修改（无修改时调用方可跳过写盘）"""
+    if updates is target:
+        # 调用方直接修改了 get_* 返回的字典再传回，无法比较出差异，按已修改处理
+        return True
+    changed = False
+    for key, value in updates.items():
+        if key not in target or target[key] != value:
+            target[key] = value
+            changed = True
+    return changed
+
+
+def _renumber_ids(records: List[Dict]) -> int:
+    """为重复或非整数的记录id重新编号（旧版按列表长度分配id，删除后会产生重复），返回重新编号的记录数"""
+    seen = set()
+    pending = []
+    for record in records:
+        record_id = record.get("id")
+        if type(record_id) is int and record_id not in seen:
+            seen.add(record_id)
+        else:
+            pending.append(record)
+    next_id = max(seen, default=0) + 1
+    for record in pending:
+        record["id"] = next_id
+        next_id += 1
+    return len(pending)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """写入临时文件并刷盘后原子替换目标文件，失败时清理临时文件"""
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb', buffering=1024 * 1024) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 
 class ConfigManager:
     """配置管理器"""
     
-    def __init__(self, config_file: str = "config.json"):
+    def __init__(self, config_file: str = "config.json", save_delay: float = _SAVE_DELAY):
+        """
+        初始化配置管理器
+        
+        Args:
+            config_file: 配置文件路径
+            save_delay: 连续修改合并写盘的时间窗口（秒），为0时每次修改立即写盘
+        """
         self.config_file = config_file
+        self._save_delay = save_delay
+        self._dirty = False
+        # 上一次写盘是否失败，失败后下一次修改改为立即写盘
+        self._save_failed = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.RLock()
+        self._journal_dead = dict.fromkeys(_JOURNAL_FILES, 0)
+        # 日志文件的追加写句柄，首次追加时打开并保持，压缩或恢复前关闭
+        self._journal_handles: Dict[str, Any] = {}
+        self._journals_loaded = False
+        # 工作日志修订号，每次工作日志变化时递增，供调用方判断缓存是否失效
+        self._work_logs_revision = 0
         self.config = self.load_config()
+        # 退出时写入尚未落盘的修改
+        _instances.add(self)
+    
+    def _invalidate_sections(self) -> None:
+        """使缓存的配置分区失效"""
+        for name in _CACHED_SECTIONS:
+            self.__dict__.pop(name, None)
     
     def get_default_config(self) -> Dict[str, Any]:
-        """获取默认配置"""
-        return {
-            "work_logs": [],
-            "templates": {
-                "daily": "今日工作总结：\n\n完成事项：\n{completed_tasks}\n\n进行中事项：\n{ongoing_tasks}\n\n明日计划：\n{tomorrow_plan}",
-                "weekly": "本周工作总结：\n\n主要成果：\n{achievements}\n\n完成项目：\n{completed_projects}\n\n下周计划：\n{next_week_plan}",
-                "monthly": "本月工作总结：\n\n月度成果：\n{monthly_achievements}\n\n重要里程碑：\n{milestones}\n\n下月目标：\n{next_month_goals}"
-            },
-            "settings": {
-                "reminder_enabled": True,
-                "reminder_interval": 60,  # 分钟
-                "work_days": ["周一", "周二", "周三", "周四", "周五"],
-                "work_start_time": "09:00",
-                "work_end_time": "18:00",
-                "auto_submit_time": "20:00",
-                "startup_with_system": False,
-                "minimize_to_tray": True,
-                "show_notifications": True
-            },
-            "feishu_config": {
-                "enabled": False,
-                "app_id": "",
-                "app_secret": "",
-                "chat_id": "",
-                "auto_report_enabled": False,
-                "check_interval": 30,
-                "daily_advance_hours": 2,
-                "weekly_submit_time": "20:00",
-                "monthly_submit_time": "20:00"
-            },
-            "ai_config": {
-                "enabled": False,
-                "provider": "DeepSeek",
-                "api_key": "",
-                "api_base_url": "https://api.deepseek.com/v1",
-                "model": "deepseek-chat",
-                "temperature": 0.7,
-                "max_tokens": 1000,
-                "timeout": 30,
-                "retry_count": 3,
-                "system_prompt": "你是一个专业的工作报告助手，请根据提供的工作日志生成简洁、专业的工作报告。"
-            },
-            "ai_providers_config": {
-                "DeepSeek": {
-                    "api_key": "",
-                    "api_base_url": "https://api.deepseek.com/v1",
-                    "model": "deepseek-chat"
-                },
-                "智谱AI": {
-                    "api_key": "",
-                    "api_base_url": "https://open.bigmodel.cn/api/paas/v4",
-                    "model": "glm-4"
-                },
-                "百度文心": {
-                    "api_key": "",
-                    "api_base_url": "https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat",
-                    "model": "ernie-bot-turbo"
-                },
-                "阿里通义": {
-                    "api_key": "",
-                    "api_base_url": "https://dashscope.aliyuncs.com/api/v1",
-                    "model": "qwen-turbo"
-                },
-                "Doubao": {
-                    "api_key": "",
-                    "api_base_url": "https://ark.cn-beijing.volces.com/api/v3",
-                    "model": "doubao-lite-4k"
-                }
-            },
-            "report_history": [],
-            "submit_status": {
-                "last_submit_date": "",
-                "auto_submit_enabled": True,
-                "submit_count": 0
-            }
-        }
+        """获取默认配置（每次返回新的副本）"""
+        return _loads_config(_DEFAULT_CONFIG_BYTES)
     
     def load_config(self) -> Dict[str, Any]:
-        """加载配置文件"""
+        """加载配置文件
+        
+        工作日志和报告历史在首次访问时才从日志文件读取，启动时只解析设置部分。
+        """
+        config = self._read_config_file()
+        self._migrate_journals(config)
+        self._journals_loaded = False
+        return config
+    
+    def _read_config_file(self) -> Dict[str, Any]:
+        """读取配置文件并补全默认字段"""
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                with open(self.config_file, 'rb') as f:
+                    config = _loads_config(f.read())
                 # 合并默认配置，确保所有必要字段存在
-                default_config = self.get_default_config()
-                return self._merge_config(default_config, config)
+                return self._fill_defaults(config, self.get_default_config())
             except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"配置文件加载失败: {e}，使用默认配置")
+                logger.warning(f"配置文件加载失败: {e}，使用默认配置")
                 return self.get_default_config()
         else:
             return self.get_default_config()
     
-    def _merge_config(self, default: Dict, loaded: Dict) -> Dict:
-        """合并配置，确保所有默认字段存在"""
-        result = default.copy()
-        for key, value in loaded.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._merge_config(result[key], value)
-            else:
-                result[key] = value
-        return result
+    def _fill_defaults(self, loaded: Dict, default: Dict) -> Dict:
+        """将缺失的默认字段就地补入已加载的配置，仅在双方都是字典时向下递归"""
+        for key, value in default.items():
+            if key not in loaded:
+                loaded[key] = value
+            elif isinstance(value, dict) and isinstance(loaded[key], dict):
+                self._fill_defaults(loaded[key], value)
+        return loaded
+    
+    def _journal_path(self, key: str) -> str:
+        """获取日志文件路径（<配置文件名>.<日志名>.jsonl）"""
+        stem = os.path.splitext(self.config_file)[0]
+        return f"{stem}.{_JOURNAL_FILES[key]}"
+    
+    def _migrate_journals(self, config: Dict[str, Any]) -> None:
+        """日志文件不存在时，将旧版配置文件中的列表迁移到日志文件
+        
+        重放日志时按id合并记录，迁移前先为重复id重新编号，避免记录互相覆盖。
+        """
+        for key in _JOURNAL_FILES:
+            records = config.get(key)
+            if not records or os.path.exists(self._journal_path(key)):
+                continue
+            renumbered = _renumber_ids(records)
+            if renumbered:
+                logger.warning(f"{key} 中有 {renumbered} 条记录的id重复或无效，已重新编号")
+            try:
+                self._compact_journal(key, records)
+            except OSError as e:
+                # 迁移失败时列表仍保留在配置文件中，下次启动重试
+                logger.error(f"迁移 {key} 到日志文件失败: {e}")
+                continue
+            # 日志文件已写入并刷盘，下次保存时才从配置文件中移除已迁移的列表
+            self._dirty = True
+    
+    def _ensure_journals(self) -> None:
+        """首次访问工作日志或报告历史时从日志文件加载，并建立索引和id计数器"""
+        if self._journals_loaded:
+            return
+        with self._save_lock:
+            if self._journals_loaded:
+                return
+            self._load_journals(self.config)
+            self._rebuild_indexes()
+            self._init_id_counters()
+            self._journals_loaded = True
+            self._work_logs_revision += 1
+    
+    def _load_journals(self, config: Dict[str, Any]) -> None:
+        """从JSONL日志重放工作日志和报告历史"""
+        for key in _JOURNAL_FILES:
+            path = self._journal_path(key)
+            if not os.path.exists(path):
+                self._journal_dead[key] = 0
+                continue
+            
+            records: Dict[Any, Dict] = {}
+            line_count = 0
+            try:
+                with open(path, 'rb') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        line_count += 1
+                        try:
+                            record = _loads_config(line)
+                        except ValueError:
+                            # 写入中断导致的残缺行，跳过
+                            logger.warning(f"跳过损坏的日志记录: {path}")
+                            continue
+                        if record.get("_deleted"):
+                            records.pop(record.get("id"), None)
+                        else:
+                            records[record.get("id")] = record
+            except OSError as e:
+                logger.error(f"日志文件加载失败: {e}")
+                continue
+            
+            config[key] = list(records.values())
+            self._journal_dead[key] = line_count - len(records)
+            self._maybe_compact_journal(key, config[key])
+    
+    def _append_journal(self, key: str, record: Dict, dead: int = 0) -> None:
+        """向日志文件追加一条记录，dead为因此失效的旧行数"""
+        with self._save_lock:
+            f = self._journal_handles.get(key)
+            if f is None:
+                path = self._journal_path(key)
+                if not os.path.exists(path) and self.config[key]:
+                    # 日志文件尚未建立（如迁移失败），写入完整列表而非只追加本条记录
+                    self._compact_journal(key, self.config[key])
+                    return
+                f = self._journal_handles[key] = open(path, 'ab')
+            f.write(_dumps_record(record) + b'\n')
+            f.flush()
+            self._journal_dead[key] += dead
+            self._maybe_compact_journal(key, self.config[key])
+    
+    def _maybe_compact_journal(self, key: str, records: List[Dict]) -> None:
+        """失效行过多时压缩日志文件"""
+        dead = self._journal_dead[key]
+        if dead > _JOURNAL_COMPACT_MIN and dead > len(records):
+            self._compact_journal(key, records)
+    
+    def _compact_journal(self, key: str, records: List[Dict]) -> None:
+        """用当前记录重写日志文件，去掉被覆盖和已删除的行"""
+        with self._save_lock:
+            data = b''.join(_dumps_record(record) + b'\n' for record in records)
+            # 替换文件前关闭追加句柄，之后的追加写入新文件
+            self._close_journal(key)
+            _atomic_write(self._journal_path(key), data)
+            self._journal_dead[key] = 0
+    
+    def _close_journal(self, key: str) -> None:
+        """关闭日志文件的追加写句柄"""
+        f = self._journal_handles.pop(key, None)
+        if f is not None:
+            f.close()
     
     def save_config(self) -> bool:
-        """保存配置文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"配置文件保存失败: {e}")
+        """保存配置文件（先写临时文件再原子替换，避免写到一半损坏配置）
+        
+        工作日志和报告历史保存在各自的日志文件中，日志文件建立后才不再写入配置文件。
+        """
+        with self._save_lock:
+            try:
+                settings_only = {key: value for key, value in self.config.items()
+                                 if key not in _JOURNAL_FILES
+                                 or not os.path.exists(self._journal_path(key))}
+                _atomic_write(self.config_file, _dumps_config(settings_only))
+                self._dirty = False
+                self._save_failed = False
+                return True
+            except Exception as e:
+                logger.error(f"配置文件保存失败: {e}")
+                self._save_failed = True
+                return False
+    
+    def _schedule_save(self) -> bool:
+        """标记配置已修改并写盘，短时间内的连续修改合并为一次写盘
+        
+        时间窗口内的首次修改立即写盘并返回结果，之后的修改在窗口结束时合并写入；
+        合并写入失败后，下一次修改改为立即写盘，使写盘错误能返回给调用方。
+        """
+        with self._save_lock:
+            self._dirty = True
+            if self._save_timer is not None and not self._save_failed:
+                return True
+            result = self.save_config()
+            if self._save_delay > 0 and self._save_timer is None:
+                self._start_save_timer()
+            return result
+    
+    def _start_save_timer(self) -> None:
+        """开始合并写盘的时间窗口"""
+        self._save_timer = threading.Timer(self._save_delay, self._on_save_timer)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+    
+    def _on_save_timer(self) -> None:
+        """时间窗口结束，写入窗口内合并的修改"""
+        with self._save_lock:
+            # 定时器已被flush()取消或替换时不再处理
+            if self._save_timer is not threading.current_thread():
+                return
+            self._save_timer = None
+            if self._dirty and self.save_config():
+                # 刚写过盘，继续合并接下来的修改
+                self._start_save_timer()
+    
+    def flush(self) -> bool:
+        """立即写入尚未保存的修改"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return True
+            return self.save_config()
+    
+    def _rebuild_indexes(self) -> None:
+        """重建工作日志和报告历史的 id -> 列表位置 索引"""
+        self._indexes = {
+            key: {record.get("id"): i for i, record in enumerate(self.config.get(key, []))}
+            for key in _JOURNAL_FILES
+        }
+    
+    def _init_id_counters(self) -> None:
+        """根据已有记录的最大id初始化自增计数器，删除记录后也不会复用id"""
+        self._next_ids = {
+            key: 1 + max((record["id"] for record in self.config.get(key, [])
+                          if isinstance(record.get("id"), int)), default=0)
+            for key in _JOURNAL_FILES
+        }
+    
+    def _allocate_id(self, key: str) -> int:
+        """分配下一个记录id"""
+        record_id = self._next_ids[key]
+        self._next_ids[key] = record_id + 1
+        return record_id
+    
+    def _find_index(self, key: str, record_id: Any) -> Optional[int]:
+        """按id查找记录在列表中的位置，不存在时返回None
+        
+        列表可能被外部代码就地排序，索引与列表不一致时重建一次。
+        """
+        records = self.config[key]
+        i = self._indexes[key].get(record_id)
+        if i is not None and i < len(records) and records[i].get("id") == record_id:
+            return i
+        self._rebuild_indexes()
+        return self._indexes[key].get(record_id)
+    
+    def _remove_record(self, key: str, record_id: Any) -> bool:
+        """按id删除记录并保持其余记录的顺序，返回是否删除成功"""
+        i = self._find_index(key, record_id)
+        if i is None:
             return False
+        records = self.config[key]
+        index = self._indexes[key]
+        del records[i]
+        del index[record_id]
+        for j in range(i, len(records)):
+            index[records[j].get("id")] = j
+        return True
     
     def get_work_logs(self) -> List[Dict]:
         """获取工作日志"""
+        self._ensure_journals()
         return self.config.get("work_logs", [])
     
+    def get_work_logs_revision(self) -> int:
+        """获取工作日志修订号，工作日志增删改或重新加载后会变化"""
+        self._ensure_journals()
+        return self._work_logs_revision
+    
     def add_work_log(self, log_data: Dict) -> bool:
         """添加工作日志"""
         try:
-            log_data["id"] = len(self.config["work_logs"]) + 1
+            self._ensure_journals()
+            log_data["id"] = self._allocate_id("work_logs")
             log_data["created_at"] = datetime.now().isoformat()
             self.config["work_logs"].append(log_data)
-            return self.save_config()
+            self._indexes["work_logs"][log_data["id"]] = len(self.config["work_logs"]) - 1
+            self._work_logs_revision += 1
+            self._append_journal("work_logs", log_data)
+            return True
         except Exception as e:
-            print(f"添加工作日志失败: {e}")
+            logger.error(f"添加工作日志失败: {e}")
             return False
     
     def update_work_log(self, log_id: int, log_data: Dict) -> bool:
         """更新工作日志"""
         try:
-            for i, log in enumerate(self.config["work_logs"]):
-                if log.get("id") == log_id:
-                    log_data["id"] = log_id
-                    log_data["updated_at"] = datetime.now().isoformat()
-                    self.config["work_logs"][i] = log_data
-                    return self.save_config()
-            return False
+            self._ensure_journals()
+            i = self._find_index("work_logs", log_id)
+            if i is None:
+                return False
+            log_data["id"] = log_id
+            log_data["updated_at"] = datetime.now().isoformat()
+            self.config["work_logs"][i] = log_data
+            self._work_logs_revision += 1
+            self._append_journal("work_logs", log_data, dead=1)
+            return True
         except Exception as e:
-            print(f"更新工作日志失败: {e}")
+            logger.error(f"更新工作日志失败: {e}")
             return False
     
-    def delete_work_log(self, log_id: int) -> bool:
-        """删除工作日志"""
+    def delete_work_log(self, log_id: Union[int, Dict]) -> bool:
+        """删除工作日志（可传入日志id或日志字典）"""
         try:
-            self.config["work_logs"] = [log for log in self.config["work_logs"] if log.get("id") != log_id]
-            return self.save_config()
+            self._ensure_journals()
+            if isinstance(log_id, dict):
+                log_id = log_id.get("id")
+            if not self._remove_record("work_logs", log_id):
+                return False
+            self._work_logs_revision += 1
+            # 写入删除标记，原记录行与标记行均视为失效
+            self._append_journal("work_logs", {"id": log_id, "_deleted": True}, dead=2)
+            return True
         except Exception as e:
-            print(f"删除工作日志失败: {e}")
+            logger.error(f"删除工作日志失败: {e}")
             return False
     
     def get_templates(self) -> Dict[str, str]:
@@ -180,62 +559,87 @@ class ConfigManager:
     def update_template(self, template_type: str, content: str) -> bool:
         """更新报告模板"""
         try:
-            self.config["templates"][template_type] = content
-            return self.save_config()
+            templates = self.config["templates"]
+            if templates.get(template_type) == content:
+                return True
+            templates[template_type] = content
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新模板失败: {e}")
+            logger.error(f"更新模板失败: {e}")
             return False
             
     def save_report_templates(self, templates: Dict[str, str]) -> bool:
         """保存报告模板（兼容方法）"""
         try:
             self.config["templates"] = templates
-            return self.save_config()
+            return self._schedule_save()
         except Exception as e:
-            print(f"保存模板失败: {e}")
+            logger.error(f"保存模板失败: {e}")
             return False
     
     def get_config(self) -> Dict[str, Any]:
         """获取完整配置"""
+        self._ensure_journals()
         return self.config
     
+    @cached_property
+    def settings(self) -> Dict[str, Any]:
+        """应用设置（缓存的配置分区）"""
+        return self.config.get("settings", {})
+    
     def get_settings(self) -> Dict[str, Any]:
         """获取应用设置"""
-        return self.config.get("settings", {})
+        return self.settings
     
     def update_settings(self, settings: Dict[str, Any]) -> bool:
         """更新应用设置"""
         try:
-            self.config["settings"].update(settings)
-            return self.save_config()
+            self.__dict__.pop("settings", None)
+            if not _apply_updates(self.config["settings"], settings):
+                return True
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新设置失败: {e}")
+            logger.error(f"更新设置失败: {e}")
             return False
     
+    @cached_property
+    def feishu_config(self) -> Dict[str, Any]:
+        """飞书配置（缓存的配置分区）"""
+        return self.config.get("feishu_config", {})
+    
     def get_feishu_config(self) -> Dict[str, Any]:
         """获取飞书配置"""
-        return self.config.get("feishu_config", {})
+        return self.feishu_config
     
     def update_feishu_config(self, config: Dict[str, Any]) -> bool:
         """更新飞书配置"""
         try:
-            self.config["feishu_config"].update(config)
-            return self.save_config()
+            self.__dict__.pop("feishu_config", None)
+            if not _apply_updates(self.config["feishu_config"], config):
+                return True
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新飞书配置失败: {e}")
+            logger.error(f"更新飞书配置失败: {e}")
             return False
     
+    @cached_property
+    def ai_config(self) -> Dict[str, Any]:
+        """AI配置（缓存的配置分区）"""
+        return self.config.get("ai_config", {})
+    
     def get_ai_config(self) -> Dict[str, Any]:
         """获取AI配置"""
-        return self.config.get("ai_config", {})
+        return self.ai_config
     
     def update_ai_config(self, config: Dict[str, Any]) -> bool:
         """更新AI配置"""
         try:
-            self.config["ai_config"].update(config)
-            return self.save_config()
+            self.__dict__.pop("ai_config", None)
+            if not _apply_updates(self.config["ai_config"], config):
+                return True
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新AI配置失败: {e}")
+            logger.error(f"更新AI配置失败: {e}")
             return False
     
     def get_ai_providers_config(self) -> Dict[str, Any]:
@@ -254,43 +658,58 @@ class ConfigManager:
                 self.config["ai_providers_config"] = {}
             if provider not in self.config["ai_providers_config"]:
                 self.config["ai_providers_config"][provider] = {}
-            self.config["ai_providers_config"][provider].update(config)
-            return self.save_config()
+            if not _apply_updates(self.config["ai_providers_config"][provider], config):
+                return True
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新AI提供商配置失败: {e}")
+            logger.error(f"更新AI提供商配置失败: {e}")
             return False
     
     def get_report_history(self) -> List[Dict]:
         """获取报告历史"""
+        self._ensure_journals()
         return self.config.get("report_history", [])
     
     def add_report_history(self, report_data: Dict) -> bool:
         """添加报告历史"""
         try:
-            report_data["id"] = len(self.config["report_history"]) + 1
+            self._ensure_journals()
+            report_data["id"] = self._allocate_id("report_history")
             report_data["created_at"] = datetime.now().isoformat()
             self.config["report_history"].append(report_data)
-            return self.save_config()
+            self._indexes["report_history"][report_data["id"]] = len(self.config["report_history"]) - 1
+            self._append_journal("report_history", report_data)
+            return True
         except Exception as e:
-            print(f"添加报告历史失败: {e}")
+            logger.error(f"添加报告历史失败: {e}")
             return False
     
-    def delete_report_history(self, report_id: int) -> bool:
-        """删除报告历史"""
+    def delete_report_history(self, report_id: Union[int, Dict]) -> bool:
+        """删除报告历史（可传入报告id或报告字典）"""
         try:
-            self.config["report_history"] = [report for report in self.config["report_history"] if report.get("id") != report_id]
-            return self.save_config()
+            self._ensure_journals()
+            if isinstance(report_id, dict):
+                report_id = report_id.get("id")
+            if not self._remove_record("report_history", report_id):
+                return False
+            self._append_journal("report_history", {"id": report_id, "_deleted": True}, dead=2)
+            return True
         except Exception as e:
-            print(f"删除报告历史失败: {e}")
+            logger.error(f"删除报告历史失败: {e}")
             return False
     
     def clear_report_history(self) -> bool:
         """清空报告历史"""
         try:
+            self._ensure_journals()
+            if not self.config["report_history"] and not self._journal_dead["report_history"]:
+                return True
             self.config["report_history"] = []
-            return self.save_config()
+            self._indexes["report_history"] = {}
+            self._compact_journal("report_history", [])
+            return True
         except Exception as e:
-            print(f"清空报告历史失败: {e}")
+            logger.error(f"清空报告历史失败: {e}")
             return False
     
     def get_submit_status(self) -> Dict[str, Any]:
@@ -300,29 +719,44 @@ class ConfigManager:
     def update_submit_status(self, status: Dict[str, Any]) -> bool:
         """更新提交状态"""
         try:
-            self.config["submit_status"].update(status)
-            return self.save_config()
+            if not _apply_updates(self.config["submit_status"], status):
+                return True
+            return self._schedule_save()
         except Exception as e:
-            print(f"更新提交状态失败: {e}")
+            logger.error(f"更新提交状态失败: {e}")
             return False
     
     def backup_config(self, backup_path: str) -> bool:
         """备份配置文件"""
         try:
-            import shutil
-            shutil.copy2(self.config_file, backup_path)
+            self._ensure_journals()
+            # 备份包含工作日志和报告历史的完整配置，便于单文件恢复
+            self.flush()
+            _atomic_write(backup_path, _dumps_config(self.config))
             return True
         except Exception as e:
-            print(f"备份配置失败: {e}")
+            logger.error(f"备份配置失败: {e}")
             return False
     
     def restore_config(self, backup_path: str) -> bool:
         """恢复配置文件"""
         try:
-            import shutil
-            shutil.copy2(backup_path, self.config_file)
-            self.config = self.load_config()
+            with self._save_lock:
+                # 丢弃待写入的修改，避免延迟写盘覆盖恢复后的文件
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                self._dirty = False
+                shutil.copy2(backup_path, self.config_file)
+                # 删除现有日志文件，使加载时从备份中的列表重新生成
+                for key in _JOURNAL_FILES:
+                    self._close_journal(key)
+                    path = self._journal_path(key)
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.config = self.load_config()
+                self._invalidate_sections()
             return True
         except Exception as e:
-            print(f"恢复配置失败: {e}")
+            logger.error(f"恢复配置失败: {e}")
             return False
\ No newline at end of file
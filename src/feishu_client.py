@@ -6,22 +6,113 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import calendar
 import json
 import time
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import date, datetime, timedelta
 import logging
 
+try:
+    # 可选依赖：orjson 编码更快，未安装时退回标准库json
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps_json(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节串（不转义中文）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# 自动提交检查的汇报类型及其中文名称（按检查顺序）
+_REPORT_TYPE_NAMES = (("daily", "日报"), ("weekly", "周报"), ("monthly", "月报"))
+
+# 文本/Markdown格式报告的固定前后缀
+_TEXT_PREFIX = "📋 工作"
+_TEXT_SUFFIX = "\n\n🤖 由牛马日报助手自动生成"
+_MD_PREFIX = "📋 **工作"
+_MD_SUFFIX = "\n\n🤖 *由牛马日报助手自动生成*"
+
+# 报告卡片中固定不变的部分（仅用于序列化，不应修改）
+_CARD_CONFIG = {"wide_screen_mode": True}
+_CARD_DIVIDER = {"tag": "hr"}
+_CARD_FOOTER = {
+    "tag": "div",
+    "text": {
+        "content": "🤖 *由牛马日报助手自动生成*",
+        "tag": "lark_md"
+    }
+}
+
+
+@lru_cache(maxsize=64)
+def _deadlines_for(day: date, report_type: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """计算指定日期所在周期的 (截止时间, 提交时间)，未知类型返回 (None, None)"""
+    if report_type == "daily":
+        # 日报：当天18点截止，提前2小时（16:00）提交
+        return (datetime(day.year, day.month, day.day, 18, 0),
+                datetime(day.year, day.month, day.day, 16, 0))
+    
+    if report_type == "weekly":
+        # 周报：本周（或下周）五晚上8点提交
+        friday = day + timedelta(days=(4 - day.weekday()) % 7)
+        return (datetime(friday.year, friday.month, friday.day, 23, 59, 59),
+                datetime(friday.year, friday.month, friday.day, 20, 0))
+    
+    if report_type == "monthly":
+        # 月报：月末最后一天晚上8点提交
+        last_day = calendar.monthrange(day.year, day.month)[1]
+        return (datetime(day.year, day.month, last_day, 23, 59, 59),
+                datetime(day.year, day.month, last_day, 20, 0))
+    
+    return None, None
+
 
 class FeishuClient:
     """飞书API客户端"""
     
+    # 进程内共享的访问令牌缓存：(app_id, app_secret) -> (token, 过期时间)
+    _token_cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    _token_lock = threading.Lock()
+    
     def __init__(self, app_id: str, app_secret: str):
         self.app_id = app_id
         self.app_secret = app_secret
         self.base_url = "https://open.feishu.cn/open-apis"
         self.tenant_access_token = None
         self.token_expire_time = 0
+        
+        # 复用同一会话保持与飞书服务器的长连接，避免每次请求重新握手
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json; charset=utf-8"})
+        # 连接失败和临时性错误状态码由传输层按指数退避自动重试；
+        # 读超时不重试，避免服务端已处理的消息被重复发送
+        retry = Retry(
+            total=3,
+            read=0,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def close(self):
+        """关闭HTTP会话"""
+        self.session.close()
     
     def get_tenant_access_token(self) -> Optional[str]:
         """获取tenant_access_token"""
@@ -29,31 +120,37 @@ class FeishuClient:
         if self.tenant_access_token and time.time() < self.token_expire_time:
             return self.tenant_access_token
         
-        url = f"{self.base_url}/auth/v3/tenant_access_token/internal"
-        headers = {
-            "Content-Type": "application/json; charset=utf-8"
-        }
-        data = {
-            "app_id": self.app_id,
-            "app_secret": self.app_secret
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=data, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            if result.get("code") == 0:
-                self.tenant_access_token = result["tenant_access_token"]
-                # 设置过期时间（提前5分钟刷新）
-                self.token_expire_time = time.time() + result["expire"] - 300
+        cache_key = (self.app_id, self.app_secret)
+        # 持锁刷新，避免多个线程/实例同时重复请求token
+        with self._token_lock:
+            cached = self._token_cache.get(cache_key)
+            if cached and time.time() < cached[1]:
+                self.tenant_access_token, self.token_expire_time = cached
                 return self.tenant_access_token
-            else:
-                print(f"获取token失败: {result.get('msg')}")
+            
+            url = f"{self.base_url}/auth/v3/tenant_access_token/internal"
+            data = {
+                "app_id": self.app_id,
+                "app_secret": self.app_secret
+            }
+            
+            try:
+                response = self.session.post(url, json=data, timeout=10)
+                response.raise_for_status()
+                
+                result = response.json()
+                if result.get("code") == 0:
+                    self.tenant_access_token = result["tenant_access_token"]
+                    # 设置过期时间（提前5分钟刷新）
+                    self.token_expire_time = time.time() + result["expire"] - 300
+                    self._token_cache[cache_key] = (self.tenant_access_token, self.token_expire_time)
+                    return self.tenant_access_token
+                else:
+                    logger.error(f"获取token失败: {result.get('msg')}")
+                    return None
+            except Exception as e:
+                logger.error(f"获取token异常: {e}")
                 return None
-        except Exception as e:
-            print(f"获取token异常: {e}")
-            return None
     
     def get_chat_info(self, chat_id: str) -> Optional[Dict]:
         """获取群聊信息"""
@@ -62,66 +159,60 @@ class FeishuClient:
             return None
         
         url = f"{self.base_url}/im/v1/chats/{chat_id}"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json; charset=utf-8"
-        }
+        headers = {"Authorization": f"Bearer {token}"}
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             result = response.json()
             if result.get("code") == 0:
                 return result["data"]
             else:
-                print(f"获取群聊信息失败: {result.get('msg')}")
+                logger.error(f"获取群聊信息失败: {result.get('msg')}")
                 return None
         except Exception as e:
-            print(f"获取群聊信息异常: {e}")
+            logger.error(f"获取群聊信息异常: {e}")
             return None
     
     def send_message(self, chat_id: str, message_type: str, content: Dict) -> bool:
-        """发送消息到群聊"""
+        """发送消息到群聊（在调用线程直接发送，并发调用各自使用连接池中的连接）"""
         token = self.get_tenant_access_token()
         if not token:
             return False
         
         url = f"{self.base_url}/im/v1/messages"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json; charset=utf-8"
-        }
+        headers = {"Authorization": f"Bearer {token}"}
         
-        data = {
+        # 消息体一次性序列化后直接发送，content字段按接口要求为JSON字符串
+        body = _dumps_json({
             "receive_id": chat_id,
             "receive_id_type": "chat_id",
             "msg_type": message_type,
-            "content": json.dumps(content, ensure_ascii=False)
-        }
+            "content": _dumps_json(content).decode("utf-8")
+        })
         
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = self.session.post(url, headers=headers, data=body, timeout=10)
             response.raise_for_status()
             
             result = response.json()
             if result.get("code") == 0:
                 return True
             else:
-                print(f"发送消息失败: {result.get('msg')}")
+                logger.error(f"发送消息失败: {result.get('msg')}")
                 return False
         except Exception as e:
-            print(f"发送消息异常: {e}")
+            logger.error(f"发送消息异常: {e}")
             return False
     
     def create_report_card(self, report_content: str, report_type: str = "日报") -> Dict:
         """创建报告卡片消息"""
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
         
-        card_content = {
-            "config": {
-                "wide_screen_mode": True
-            },
+        # 只为随报告变化的部分新建字典，固定部分复用模块级常量
+        return {
+            "config": _CARD_CONFIG,
             "elements": [
                 {
                     "tag": "div",
@@ -130,9 +221,7 @@ class FeishuClient:
                         "tag": "lark_md"
                     }
                 },
-                {
-                    "tag": "hr"
-                },
+                _CARD_DIVIDER,
                 {
                     "tag": "div",
                     "text": {
@@ -140,16 +229,8 @@ class FeishuClient:
                         "tag": "lark_md"
                     }
                 },
-                {
-                    "tag": "hr"
-                },
-                {
-                    "tag": "div",
-                    "text": {
-                        "content": "🤖 *由牛马日报助手自动生成*",
-                        "tag": "lark_md"
-                    }
-                }
+                _CARD_DIVIDER,
+                _CARD_FOOTER
             ],
             "header": {
                 "template": "blue",
@@ -159,20 +240,18 @@ class FeishuClient:
                 }
             }
         }
-        
-        return card_content
     
     def send_report(self, chat_id: str, report_content: str, 
                    message_format: str = "card", report_type: str = "日报") -> bool:
         """发送报告到飞书群聊"""
         if message_format == "text":
             # 纯文本格式
-            content = {"text": f"📋 工作{report_type}\n\n{report_content}\n\n🤖 由牛马日报助手自动生成"}
+            content = {"text": _TEXT_PREFIX + report_type + "\n\n" + report_content + _TEXT_SUFFIX}
             return self.send_message(chat_id, "text", content)
         
         elif message_format == "markdown":
             # Markdown格式
-            md_content = f"📋 **工作{report_type}**\n\n{report_content}\n\n🤖 *由牛马日报助手自动生成*"
+            md_content = _MD_PREFIX + report_type + "**\n\n" + report_content + _MD_SUFFIX
             content = {"content": md_content}
             return self.send_message(chat_id, "post", content)
         
@@ -200,12 +279,9 @@ class FeishuClient:
         # 测试API调用
         try:
             url = f"{self.base_url}/im/v1/chats"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=utf-8"
-            }
+            headers = {"Authorization": f"Bearer {token}"}
             
-            response = requests.get(url, headers=headers, timeout=10, params={"page_size": 1})
+            response = self.session.get(url, headers=headers, timeout=10, params={"page_size": 1})
             response.raise_for_status()
             
             api_result = response.json()
@@ -240,10 +316,7 @@ class FeishuClient:
             return None
         
         url = f"{self.base_url}/report/v1/rules/query"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json; charset=utf-8"
-        }
+        headers = {"Authorization": f"Bearer {token}"}
         
         params = {
             "include_deleted": include_deleted,
@@ -254,17 +327,17 @@ class FeishuClient:
             params["rule_name"] = rule_name
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             result = response.json()
             if result.get("code") == 0:
                 return result.get("data")
             else:
-                logging.error(f"查询汇报规则失败: {result.get('msg')}")
+                logger.error(f"查询汇报规则失败: {result.get('msg')}")
                 return None
         except Exception as e:
-            logging.error(f"查询汇报规则异常: {e}")
+            logger.error(f"查询汇报规则异常: {e}")
             return None
     
     def check_report_submission_status(self, rule_name: str, 
@@ -321,43 +394,12 @@ class FeishuClient:
             "should_submit": False
         }
         
-        if report_type == "daily":
-            # 日报：当天截止时间前2小时提交
-            deadline = now.replace(hour=18, minute=0, second=0, microsecond=0)
-            submit_time = deadline - timedelta(hours=2)  # 16:00提交
+        deadline, submit_time = _deadlines_for(now.date(), report_type)
+        if deadline is not None:
             result["deadline"] = deadline
             result["submit_time"] = submit_time
-            result["should_submit"] = now >= submit_time and now <= deadline
-            
-        elif report_type == "weekly":
-            # 周报：周五晚上8点提交
-            days_until_friday = (4 - now.weekday()) % 7
-            if days_until_friday == 0 and now.weekday() == 4:  # 今天是周五
-                deadline = now.replace(hour=23, minute=59, second=59, microsecond=0)
-                submit_time = now.replace(hour=20, minute=0, second=0, microsecond=0)
-            else:
-                friday = now + timedelta(days=days_until_friday)
-                deadline = friday.replace(hour=23, minute=59, second=59, microsecond=0)
-                submit_time = friday.replace(hour=20, minute=0, second=0, microsecond=0)
-            
-            result["deadline"] = deadline
-            result["submit_time"] = submit_time
-            result["should_submit"] = (now.weekday() == 4 and 
-                                     now >= submit_time and 
-                                     now <= deadline)
-            
-        elif report_type == "monthly":
-            # 月报：月末最后一天晚上8点提交
-            next_month = now.replace(day=28) + timedelta(days=4)
-            last_day = next_month - timedelta(days=next_month.day)
-            deadline = last_day.replace(hour=23, minute=59, second=59, microsecond=0)
-            submit_time = last_day.replace(hour=20, minute=0, second=0, microsecond=0)
-            
-            result["deadline"] = deadline
-            result["submit_time"] = submit_time
-            result["should_submit"] = (now.date() == last_day.date() and 
-                                     now >= submit_time and 
-                                     now <= deadline)
+            # 截止时间与提交时间都落在汇报当天，只需判断当前时间是否在区间内
+            result["should_submit"] = submit_time <= now <= deadline
         
         return result
     
@@ -410,63 +452,42 @@ class FeishuClient:
         Returns:
             提交结果列表
         """
-        results = []
-        
-        # 检查日报
-        daily_deadline = self.get_report_deadlines("daily")
-        if daily_deadline["should_submit"]:
-            try:
-                daily_content = report_generator_func("daily")
-                if daily_content:
-                    submit_result = self.auto_submit_report(
-                        chat_id, daily_content, "日报"
-                    )
-                    submit_result["type"] = "日报"
-                    results.append(submit_result)
-            except Exception as e:
-                results.append({
-                    "type": "日报",
-                    "success": False,
-                    "message": f"日报生成失败: {str(e)}"
-                })
-        
-        # 检查周报
-        weekly_deadline = self.get_report_deadlines("weekly")
-        if weekly_deadline["should_submit"]:
-            try:
-                weekly_content = report_generator_func("weekly")
-                if weekly_content:
-                    submit_result = self.auto_submit_report(
-                        chat_id, weekly_content, "周报"
-                    )
-                    submit_result["type"] = "周报"
-                    results.append(submit_result)
-            except Exception as e:
-                results.append({
-                    "type": "周报",
-                    "success": False,
-                    "message": f"周报生成失败: {str(e)}"
-                })
-        
-        # 检查月报
-        monthly_deadline = self.get_report_deadlines("monthly")
-        if monthly_deadline["should_submit"]:
-            try:
-                monthly_content = report_generator_func("monthly")
-                if monthly_content:
-                    submit_result = self.auto_submit_report(
-                        chat_id, monthly_content, "月报"
-                    )
-                    submit_result["type"] = "月报"
-                    results.append(submit_result)
-            except Exception as e:
-                results.append({
-                    "type": "月报",
-                    "success": False,
-                    "message": f"月报生成失败: {str(e)}"
-                })
+        # 筛选当前需要提交的汇报类型，多种汇报同时到期时并发生成和发送
+        due_types = [
+            (report_type, type_name) for report_type, type_name in _REPORT_TYPE_NAMES
+            if self.get_report_deadlines(report_type)["should_submit"]
+        ]
+        if not due_types:
+            return []
+        
+        def submit(item):
+            report_type, type_name = item
+            return self._generate_and_submit(chat_id, report_generator_func, report_type, type_name)
+        
+        if len(due_types) == 1:
+            results = [submit(due_types[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(due_types)) as executor:
+                results = list(executor.map(submit, due_types))
         
-        return results
+        return [result for result in results if result]
+    
+    def _generate_and_submit(self, chat_id: str, report_generator_func, 
+                       report_type: str, type_name: str) -> Optional[Dict[str, Any]]:
+        """生成并提交单个类型的汇报，没有内容时返回None"""
+        try:
+            content = report_generator_func(report_type)
+            if not content:
+                return None
+            submit_result = self.auto_submit_report(chat_id, content, type_name)
+            submit_result["type"] = type_name
+            return submit_result
+        except Exception as e:
+            return {
+                "type": type_name,
+                "success": False,
+                "message": f"{type_name}生成失败: {str(e)}"
+            }
 
 
 def test_feishu_connection(app_id: str, app_secret: str) -> Dict[str, Any]:
@@ -484,8 +505,12 @@ def test_feishu_connection(app_id: str, app_secret: str) -> Dict[str, Any]:
 
 def submit_to_feishu(app_id: str, app_secret: str, chat_id: str, 
                     report_content: str, message_format: str = "card", 
-                    report_type: str = "日报") -> Dict[str, Any]:
-    """提交报告到飞书的便捷函数"""
+                    report_type: str = "日报",
+                    client: Optional[FeishuClient] = None) -> Dict[str, Any]:
+    """提交报告到飞书的便捷函数
+    
+    可传入已有的client复用其连接；发送失败时才进行连接测试以给出具体原因。
+    """
     result = {
         "success": False,
         "message": ""
@@ -496,22 +521,23 @@ def submit_to_feishu(app_id: str, app_secret: str, chat_id: str,
         return result
     
     try:
-        client = FeishuClient(app_id, app_secret)
-        
-        # 测试连接
-        test_result = client.test_connection()
-        if not test_result["success"]:
-            result["message"] = f"连接测试失败: {test_result['message']}"
-            return result
+        if client is None:
+            client = FeishuClient(app_id, app_secret)
         
         # 发送报告
         if client.send_report(chat_id, report_content, message_format, report_type):
             result["success"] = True
             result["message"] = "报告提交成功"
+            return result
+        
+        # 发送失败时测试连接，区分配置问题和群聊ID问题
+        test_result = client.test_connection()
+        if not test_result["success"]:
+            result["message"] = f"连接测试失败: {test_result['message']}"
         else:
             result["message"] = "报告发送失败，请检查群聊ID是否正确"
     
     except Exception as e:
         result["message"] = f"提交异常: {str(e)}"
     
-    return result
\ No newline at end of file
+    return result
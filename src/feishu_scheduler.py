@@ -8,40 +8,74 @@
 import threading
 import time
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, Callable, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Callable, Optional
 from feishu_client import FeishuClient
 from config_manager import ConfigManager
 
+# 汇报类型对应的提交状态字段
+_SUBMIT_STATUS_KEYS = {
+    "日报": "last_daily_submit",
+    "周报": "last_weekly_submit",
+    "月报": "last_monthly_submit"
+}
+
+# Qt模式下上一次检查仍在进行时，稍后重试的间隔（毫秒）
+_BUSY_RETRY_MS = 1000
+
 
 class FeishuScheduler:
     """飞书自动提交调度器"""
     
-    def __init__(self, config_manager: ConfigManager, report_generator_func: Callable):
+    def __init__(self, config_manager: ConfigManager, report_generator_func: Callable,
+                 qt_mode: bool = False):
         """
         初始化调度器
         
         Args:
             config_manager: 配置管理器
             report_generator_func: 报告生成函数，接受report_type参数
+            qt_mode: 是否由Qt事件循环的定时器驱动，不常驻调度线程
         """
         self.config_manager = config_manager
         self.report_generator_func = report_generator_func
         self.feishu_client = None
+        # 客户端对应的凭证及是否已通过连接测试，凭证不变且已验证时不再重复测试
+        self._client_credentials = None
+        self._client_verified = False
         self.scheduler_thread = None
+        self.qt_mode = qt_mode
+        self._timer = None
         self.running = False
         self.check_interval = 300  # 5分钟检查一次
-        self.last_check_time = None
+        self.last_check_time = None  # 上次检查的time.monotonic()时间
+        # 缓存当天日期字符串，跨天时重新生成
+        self._today_str = None
+        self._today_ordinal = None
+        # 用于提前唤醒调度线程（停止或强制检查时）
+        self._wake = threading.Event()
+        # 飞书配置已更改，下次检查前需重新初始化客户端
+        self._config_dirty = False
+        # 截止时间信息按分钟缓存：(分钟序号, 结果)
+        self._deadline_cache = (None, None)
         
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    def _today(self) -> str:
+        """获取当天日期字符串（YYYY-MM-DD）"""
+        today = date.today()
+        ordinal = today.toordinal()
+        if ordinal != self._today_ordinal:
+            self._today_str = today.isoformat()
+            self._today_ordinal = ordinal
+        return self._today_str
+    
     def _init_feishu_client(self) -> bool:
         """初始化飞书客户端"""
         try:
-            config = self.config_manager.get_config()
-            feishu_config = config.get("feishu_config", {})
+            feishu_config = self.config_manager.get_feishu_config()
             
             if not feishu_config.get("enabled", False):
                 self.logger.info("飞书集成未启用")
@@ -54,11 +88,21 @@ class FeishuScheduler:
                 self.logger.error("飞书配置不完整，缺少app_id或app_secret")
                 return False
             
-            self.feishu_client = FeishuClient(app_id, app_secret)
+            credentials = (app_id, app_secret)
+            if self.feishu_client is None or credentials != self._client_credentials:
+                if self.feishu_client is not None:
+                    self.feishu_client.close()
+                self.feishu_client = FeishuClient(app_id, app_secret)
+                self._client_credentials = credentials
+                self._client_verified = False
+            
+            if self._client_verified:
+                return True
             
             # 测试连接
             test_result = self.feishu_client.test_connection()
             if test_result["success"]:
+                self._client_verified = True
                 self.logger.info("飞书客户端初始化成功")
                 return True
             else:
@@ -69,29 +113,15 @@ class FeishuScheduler:
             self.logger.error(f"初始化飞书客户端失败: {e}")
             return False
     
-    def _should_check_now(self) -> bool:
-        """判断是否应该进行检查"""
-        now = datetime.now()
-        
-        # 如果是第一次检查
-        if self.last_check_time is None:
-            return True
-        
-        # 检查时间间隔
-        if (now - self.last_check_time).total_seconds() >= self.check_interval:
-            return True
-        
-        return False
-    
     def _check_and_submit_reports(self) -> None:
         """检查并提交汇报"""
         try:
-            if not self.feishu_client:
+            if self._config_dirty or not self._client_verified:
+                self._config_dirty = False
                 if not self._init_feishu_client():
                     return
             
-            config = self.config_manager.get_config()
-            feishu_config = config.get("feishu_config", {})
+            feishu_config = self.config_manager.get_feishu_config()
             
             # 检查是否启用自动汇报
             if not feishu_config.get("auto_report_enabled", False):
@@ -111,36 +141,36 @@ class FeishuScheduler:
             for result in results:
                 if result["success"]:
                     self.logger.info(f"{result['type']}自动提交成功")
-                    self._update_submit_status(result["type"], True)
                 else:
                     self.logger.error(f"{result['type']}自动提交失败: {result['message']}")
-            
-            self.last_check_time = datetime.now()
+                    # 提交失败时下次检查重新测试连接
+                    self._client_verified = False
+            self._update_submit_status_batch(results)
             
         except Exception as e:
             self.logger.error(f"检查和提交汇报时发生异常: {e}")
     
-    def _update_submit_status(self, report_type: str, success: bool) -> None:
-        """更新提交状态"""
+    def _update_submit_status_batch(self, results: List[Dict[str, Any]]) -> None:
+        """根据一批提交结果更新提交状态，只写入一次"""
         try:
-            config = self.config_manager.get_config()
-            submit_status = config.get("submit_status", {})
+            succeeded = [result["type"] for result in results if result["success"]]
+            if not succeeded:
+                return
+            
+            submit_status = self.config_manager.get_submit_status()
+            updates = {}
             
-            today = datetime.now().strftime("%Y-%m-%d")
+            today = self._today()
             
-            if report_type == "日报":
-                submit_status["last_daily_submit"] = today
-            elif report_type == "周报":
-                submit_status["last_weekly_submit"] = today
-            elif report_type == "月报":
-                submit_status["last_monthly_submit"] = today
+            for report_type in succeeded:
+                status_key = _SUBMIT_STATUS_KEYS.get(report_type)
+                if status_key:
+                    updates[status_key] = today
             
-            if success:
-                submit_status["last_submit_date"] = today
-                submit_status["submit_count"] = submit_status.get("submit_count", 0) + 1
+            updates["last_submit_date"] = today
+            updates["submit_count"] = submit_status.get("submit_count", 0) + len(succeeded)
             
-            config["submit_status"] = submit_status
-            self.config_manager.save_config(config)
+            self.config_manager.update_submit_status(updates)
             
         except Exception as e:
             self.logger.error(f"更新提交状态失败: {e}")
@@ -151,18 +181,51 @@ class FeishuScheduler:
         
         while self.running:
             try:
-                if self._should_check_now():
-                    self._check_and_submit_reports()
+                # 第一次立即检查，之后等待到下一个检查间隔
+                if self.last_check_time is None:
+                    remaining = 0
+                else:
+                    remaining = max(0, self.check_interval - (time.monotonic() - self.last_check_time))
+                
+                # stop()或force_check()会提前唤醒，唤醒后重新计算等待时间
+                if self._wake.wait(timeout=remaining):
+                    self._wake.clear()
+                    # 配置重新加载时立即检查一次，以便尽快应用新配置
+                    if not self._config_dirty:
+                        continue
                 
-                # 休眠一段时间再检查
-                time.sleep(60)  # 每分钟检查一次是否需要执行
+                self._check_and_submit_reports()
+                self.last_check_time = time.monotonic()
                 
             except Exception as e:
                 self.logger.error(f"调度器循环中发生异常: {e}")
-                time.sleep(60)
+                self._wake.wait(timeout=60)
         
         self.logger.info("飞书自动提交调度器已停止")
     
+    def _tick(self) -> None:
+        """Qt定时器触发的检查（Qt模式）"""
+        if not self.running:
+            return
+        
+        if self.scheduler_thread and self.scheduler_thread.is_alive():
+            # 上一次检查仍在进行，稍后重试，避免重新加载配置等提前触发的检查被丢弃
+            self._timer.start(_BUSY_RETRY_MS)
+            return
+        
+        # 先安排下一次检查，再在后台线程执行本次检查，避免网络请求阻塞界面
+        self._timer.start(self.check_interval * 1000)
+        self.scheduler_thread = threading.Thread(target=self._run_check, daemon=True)
+        self.scheduler_thread.start()
+    
+    def _run_check(self) -> None:
+        """执行一次检查并记录检查时间"""
+        try:
+            self._check_and_submit_reports()
+        except Exception as e:
+            self.logger.error(f"调度器检查时发生异常: {e}")
+        self.last_check_time = time.monotonic()
+    
     def start(self) -> bool:
         """启动调度器"""
         if self.running:
@@ -174,6 +237,19 @@ class FeishuScheduler:
             return False
         
         self.running = True
+        
+        if self.qt_mode:
+            from PyQt5.QtCore import QTimer
+            
+            if self._timer is None:
+                self._timer = QTimer()
+                self._timer.setSingleShot(True)
+                self._timer.timeout.connect(self._tick)
+            self._timer.start(0)
+            self.logger.info("飞书自动提交调度器已启动")
+            return True
+        
+        self._wake.clear()
         self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
         self.scheduler_thread.start()
         
@@ -185,12 +261,36 @@ class FeishuScheduler:
             return
         
         self.running = False
+        self._wake.set()
+        if self._timer is not None:
+            self._timer.stop()
         
-        if self.scheduler_thread and self.scheduler_thread.is_alive():
+        # Qt模式下stop()在界面线程调用，不等待进行中的检查（检查线程为守护线程，完成后自行退出）
+        if not self.qt_mode and self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join(timeout=5)
         
         self.logger.info("调度器停止完成")
     
+    def reload_config(self) -> bool:
+        """重新加载飞书配置
+        
+        运行中时只标记配置已更改并唤醒调度线程，凭证变化时才重建客户端；
+        未运行时启动调度器，飞书集成被禁用时停止调度器。
+        """
+        if not self.running:
+            return self.start()
+        
+        if not self.config_manager.get_feishu_config().get("enabled", False):
+            self.stop()
+            return False
+        
+        self._config_dirty = True
+        if self.qt_mode:
+            self._timer.start(0)
+        else:
+            self._wake.set()
+        return True
+    
     def force_check(self) -> Dict[str, Any]:
         """强制执行一次检查"""
         result = {
@@ -200,13 +300,12 @@ class FeishuScheduler:
         }
         
         try:
-            if not self.feishu_client:
+            if not self._client_verified:
                 if not self._init_feishu_client():
                     result["message"] = "飞书客户端初始化失败"
                     return result
             
-            config = self.config_manager.get_config()
-            feishu_config = config.get("feishu_config", {})
+            feishu_config = self.config_manager.get_feishu_config()
             chat_id = feishu_config.get("chat_id")
             
             if not chat_id:
@@ -223,9 +322,11 @@ class FeishuScheduler:
             result["message"] = f"检查完成，处理了{len(submit_results)}个汇报"
             
             # 更新提交状态
-            for submit_result in submit_results:
-                if submit_result["success"]:
-                    self._update_submit_status(submit_result["type"], True)
+            self._update_submit_status_batch(submit_results)
+            
+            # 强制检查后重新计时，唤醒调度线程重新计算等待时间
+            self.last_check_time = time.monotonic()
+            self._wake.set()
             
         except Exception as e:
             result["message"] = f"强制检查失败: {str(e)}"
@@ -237,11 +338,19 @@ class FeishuScheduler:
         if not self.feishu_client:
             return {"error": "飞书客户端未初始化"}
         
-        return {
+        # 截止时间信息在同一分钟内不变，直接复用
+        minute = int(time.time() // 60)
+        cached_minute, deadlines = self._deadline_cache
+        if minute == cached_minute:
+            return deadlines
+        
+        deadlines = {
             "daily": self.feishu_client.get_report_deadlines("daily"),
             "weekly": self.feishu_client.get_report_deadlines("weekly"),
             "monthly": self.feishu_client.get_report_deadlines("monthly")
         }
+        self._deadline_cache = (minute, deadlines)
+        return deadlines
     
     def test_report_submission(self, report_type: str = "日报") -> Dict[str, Any]:
         """测试汇报提交功能"""
@@ -251,13 +360,12 @@ class FeishuScheduler:
         }
         
         try:
-            if not self.feishu_client:
+            if not self._client_verified:
                 if not self._init_feishu_client():
                     result["message"] = "飞书客户端初始化失败"
                     return result
             
-            config = self.config_manager.get_config()
-            feishu_config = config.get("feishu_config", {})
+            feishu_config = self.config_manager.get_feishu_config()
             chat_id = feishu_config.get("chat_id")
             
             if not chat_id:
@@ -8,112 +8,78 @@
 import sys
 import os
 import logging
+import logging.handlers
 import tempfile
-import psutil
-from datetime import datetime
-from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtCore import QTimer, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon
+from datetime import date
 
-# 添加项目根目录到Python路径
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.insert(0, project_root)
-
-# 导入项目模块
-from .config_manager import ConfigManager
-from .work_log_window import WorkLogWindow
-from .report_window import ReportWindow
-from .settings_window import SettingsWindow
-from .system_tray import SystemTray
-from .timer_manager import TimerManager
-from .report_generator import ReportGenerator
-from .quick_add_button import QuickAddButton
-from .feishu_scheduler import FeishuScheduler
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
 
 
 class SingleInstance:
-    """单实例检查类"""
+    """单实例检查类
+    
+    通过操作系统的文件锁保证只有一个实例运行，进程退出时锁由内核自动释放。
+    """
     
     def __init__(self, app_name="ReportHelper"):
         self.app_name = app_name
-        self.lock_file = None
         self.is_locked = False
+        self.pid = os.getpid()
+        self._fd = None
         
         # 创建锁文件路径
         temp_dir = tempfile.gettempdir()
         self.lock_file_path = os.path.join(temp_dir, f"{app_name}.lock")
     
-    def is_another_instance_running(self):
-        """检查是否有其他实例正在运行"""
+    def acquire(self):
+        """获取单实例锁，已有实例持有锁时返回False"""
         try:
-            # 检查锁文件是否存在
-            if os.path.exists(self.lock_file_path):
-                # 读取PID
-                with open(self.lock_file_path, 'r') as f:
-                    pid = int(f.read().strip())
-                
-                # 检查进程是否还在运行
-                if psutil.pid_exists(pid):
-                    try:
-                        process = psutil.Process(pid)
-                        # 检查进程名称是否匹配
-                        if "python" in process.name().lower() or "reporthelper" in process.name().lower():
-                            return True
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                
-                # 如果进程不存在，删除锁文件
-                os.remove(self.lock_file_path)
-            
+            fd = os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logging.error(f"打开锁文件失败: {e}")
             return False
-            
-        except Exception as e:
-            logging.warning(f"检查实例状态时出错: {e}")
-            return False
-    
-    def create_lock(self):
-        """创建锁文件"""
+        
         try:
-            with open(self.lock_file_path, 'w') as f:
-                f.write(str(os.getpid()))
-            self.is_locked = True
-            return True
-        except Exception as e:
-            logging.error(f"创建锁文件失败: {e}")
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # 锁已被其他实例持有
+            os.close(fd)
             return False
+        
+        # 记录PID便于排查，锁的有效性不依赖文件内容
+        try:
+            os.ftruncate(fd, 0)
+            os.write(fd, str(self.pid).encode())
+        except OSError as e:
+            logging.warning(f"写入锁文件失败: {e}")
+        
+        # 持有文件描述符直到进程退出
+        self._fd = fd
+        self.is_locked = True
+        return True
     
     def release_lock(self):
-        """释放锁文件"""
+        """释放单实例锁"""
+        if self._fd is None:
+            return
         try:
-            if self.is_locked and os.path.exists(self.lock_file_path):
-                os.remove(self.lock_file_path)
-                self.is_locked = False
-        except Exception as e:
+            if os.name == "nt":
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except OSError as e:
             logging.warning(f"释放锁文件时出错: {e}")
-    
-    def kill_existing_instance(self):
-        """终止现有实例"""
-        try:
-            if os.path.exists(self.lock_file_path):
-                with open(self.lock_file_path, 'r') as f:
-                    pid = int(f.read().strip())
-                
-                if psutil.pid_exists(pid):
-                    try:
-                        process = psutil.Process(pid)
-                        process.terminate()
-                        # 等待进程结束
-                        process.wait(timeout=5)
-                        logging.info(f"已终止现有实例 (PID: {pid})")
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.TimeoutExpired):
-                        pass
-                
-                # 删除锁文件
-                os.remove(self.lock_file_path)
-                return True
-        except Exception as e:
-            logging.error(f"终止现有实例失败: {e}")
-            return False
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self.is_locked = False
 
 
 class ApplicationManager:
@@ -128,6 +94,12 @@ class ApplicationManager:
         self.system_tray = None
         self.timer_manager = None
         self.report_generator = None
+        self._report_dispatch = {}
+        self._settings_cache = {}
+        # 上次启动调度器时的飞书配置，用于判断设置更改后是否需要重启调度器
+        self._feishu_config_snapshot = {}
+        # 当前使用的AI配置，用于判断设置更改后是否需要刷新AI生成器
+        self._ai_config_snapshot = {}
         self.quick_add_button = None
         self.feishu_scheduler = None
         self.single_instance = None
@@ -153,17 +125,27 @@ class ApplicationManager:
         """设置日志"""
         # 确保日志目录存在
         log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        os.makedirs(log_dir, exist_ok=True)
         
         # 配置日志
-        log_file = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y%m%d')}.log")
+        log_file = os.path.join(log_dir, f"app_{date.today().isoformat().replace('-', '')}.log")
+        
+        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        
+        # 文件首次写入时才打开，并通过内存缓冲批量写入，遇到ERROR或缓冲满时立即落盘
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=5_000_000, backupCount=5, encoding='utf-8', delay=True
+        )
+        file_handler.setFormatter(logging.Formatter(log_format))
+        buffered_handler = logging.handlers.MemoryHandler(
+            capacity=64, flushLevel=logging.ERROR, target=file_handler, flushOnClose=True
+        )
         
         logging.basicConfig(
             level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            format=log_format,
             handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
+                buffered_handler,
                 logging.StreamHandler(sys.stdout)
             ]
         )
@@ -177,23 +159,10 @@ class ApplicationManager:
         try:
             self.single_instance = SingleInstance("ReportHelper")
             
-            # 检查是否有其他实例正在运行
-            if self.single_instance.is_another_instance_running():
-                print("检测到应用程序已在运行，正在关闭之前的实例...")
-                
-                # 尝试终止现有实例
-                if self.single_instance.kill_existing_instance():
-                    print("已成功关闭之前的实例")
-                    import time
-                    time.sleep(1)  # 等待一秒确保进程完全结束
-                else:
-                    print("无法关闭之前的实例，程序将退出")
-                    sys.exit(1)
-            
-            # 创建锁文件
-            if not self.single_instance.create_lock():
-                print("无法创建锁文件，程序将退出")
-                sys.exit(1)
+            # 获取单实例锁
+            if not self.single_instance.acquire():
+                print("检测到应用程序已在运行，程序将退出")
+                sys.exit(0)
             
             print("单实例检查通过")
             
@@ -203,6 +172,9 @@ class ApplicationManager:
     
     def setup_application(self):
         """设置应用程序"""
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtGui import QIcon
+        
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)  # 关闭窗口时不退出应用
         
@@ -212,21 +184,41 @@ class ApplicationManager:
         self.app.setOrganizationName("Report Helper")
         
         # 设置应用程序图标
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         icon_path = os.path.join(project_root, "resources", "niuma.svg")
         if os.path.exists(icon_path):
             self.app.setWindowIcon(QIcon(icon_path))
     
     def setup_components(self):
         """设置组件"""
+        # 单实例检查通过后才导入Qt窗口等重量级模块
+        from PyQt5.QtWidgets import QMessageBox
+        from .config_manager import ConfigManager
+        from .work_log_window import WorkLogWindow
+        from .report_window import ReportWindow
+        from .settings_window import SettingsWindow
+        from .system_tray import SystemTray
+        from .timer_manager import TimerManager
+        from .report_generator import ReportGenerator
+        from .quick_add_button import QuickAddButton
+        from .feishu_scheduler import FeishuScheduler
+        
         try:
             # 初始化配置管理器
             self.config_manager = ConfigManager()
+            self._settings_cache = self.config_manager.get_settings()
+            self._ai_config_snapshot = dict(self.config_manager.get_ai_config())
             
             # 将ConfigManager设置为应用程序的属性，以便QuickAddButton可以访问
             self.app.setProperty("config_manager", self.config_manager)
             
             # 初始化报告生成器
             self.report_generator = ReportGenerator(self.config_manager)
+            self._report_dispatch = {
+                "daily": self.report_generator.generate_daily_report,
+                "weekly": self.report_generator.generate_weekly_report,
+                "monthly": self.report_generator.generate_monthly_report
+            }
             
             # 初始化定时管理器
             self.timer_manager = TimerManager(self.config_manager, self.report_generator)
@@ -257,7 +249,8 @@ class ApplicationManager:
             # 初始化飞书调度器
             self.feishu_scheduler = FeishuScheduler(
                 self.config_manager, 
-                self._generate_report_for_scheduler
+                self._generate_report_for_scheduler,
+                qt_mode=True
             )
             
             logging.info("所有组件初始化完成")
@@ -295,6 +288,7 @@ class ApplicationManager:
         """设置更改处理"""
         try:
             logging.info("设置已更改，重新加载配置")
+            self._settings_cache = self.config_manager.get_settings()
             
             # 重新加载定时器设置
             if self.timer_manager:
@@ -306,20 +300,26 @@ class ApplicationManager:
             
             # 更新快速添加按钮状态
             if self.quick_add_button:
-                settings = self.config_manager.get_settings()
-                quick_add_button_enabled = settings.get("quick_add_button", True)
+                quick_add_button_enabled = self._settings_cache.get("quick_add_button", True)
                 if quick_add_button_enabled:
                     self.quick_add_button.show()
                 else:
                     self.quick_add_button.hide()
             
-            # 重启飞书调度器
-            if self.feishu_scheduler:
-                self.feishu_scheduler.stop()
-                if self.feishu_scheduler.start():
-                    logging.info("飞书调度器已重启")
+            # AI配置有变化时刷新AI生成器，并清空按旧密钥缓存的共享客户端
+            ai_config = self.config_manager.get_ai_config()
+            if self.report_generator and ai_config != self._ai_config_snapshot:
+                self._ai_config_snapshot = dict(ai_config)
+                self.report_generator.refresh_ai_generator()
+            
+            # 飞书配置有变化时让调度器重新加载配置，无需重启线程
+            feishu_config = self.config_manager.get_feishu_config()
+            if self.feishu_scheduler and feishu_config != self._feishu_config_snapshot:
+                self._feishu_config_snapshot = dict(feishu_config)
+                if self.feishu_scheduler.reload_config():
+                    logging.info("飞书调度器配置已重新加载")
                 else:
-                    logging.warning("飞书调度器重启失败")
+                    logging.warning("飞书调度器未运行，请检查飞书配置")
             
         except Exception as e:
             logging.error(f"设置更改处理失败: {str(e)}")
@@ -345,18 +345,11 @@ class ApplicationManager:
             生成的报告内容
         """
         try:
-            if not self.report_generator:
-                return ""
-            
             # 根据类型生成相应的报告
-            if report_type == "daily":
-                return self.report_generator.generate_daily_report()
-            elif report_type == "weekly":
-                return self.report_generator.generate_weekly_report()
-            elif report_type == "monthly":
-                return self.report_generator.generate_monthly_report()
-            else:
+            generate = self._report_dispatch.get(report_type)
+            if not generate:
                 return ""
+            return generate()
                 
         except Exception as e:
             logging.error(f"为调度器生成{report_type}报告失败: {str(e)}")
@@ -430,8 +423,7 @@ class ApplicationManager:
         """运行应用程序"""
         try:
             # 检查是否启动时最小化
-            settings = self.config_manager.get_settings()
-            start_minimized = settings.get("start_minimized", False)
+            start_minimized = self._settings_cache.get("start_minimized", False)
             
             if not start_minimized:
                 self.show_main_window()
@@ -443,7 +435,7 @@ class ApplicationManager:
             # 显示快速添加按钮（根据设置）
             if self.quick_add_button:
                 # 检查是否启用快速添加按钮
-                quick_add_button_enabled = settings.get("quick_add_button", True)
+                quick_add_button_enabled = self._settings_cache.get("quick_add_button", True)
                 if quick_add_button_enabled:
                     self.quick_add_button.show()
                 else:
@@ -455,7 +447,12 @@ class ApplicationManager:
             
             # 启动飞书调度器
             if self.feishu_scheduler:
-                if self.feishu_scheduler.start():
+                feishu_config = self.config_manager.get_feishu_config()
+                self._feishu_config_snapshot = dict(feishu_config)
+                # 未启用飞书集成时不启动调度器，启用后由设置更改触发重新加载
+                if not feishu_config.get("enabled", False):
+                    logging.info("飞书集成未启用，跳过自动提交调度器")
+                elif self.feishu_scheduler.start():
                     logging.info("飞书自动提交调度器已启动")
                 else:
                     logging.warning("飞书自动提交调度器启动失败")
@@ -467,6 +464,7 @@ class ApplicationManager:
             
         except Exception as e:
             logging.error(f"应用程序运行失败: {str(e)}")
+            from PyQt5.QtWidgets import QMessageBox
             QMessageBox.critical(
                 None, "运行错误", 
                 f"应用程序运行失败：{str(e)}"
@@ -482,21 +480,25 @@ def check_environment():
             print("错误: 需要Python 3.6或更高版本")
             return False
         
+        # 一次读取当前目录，后续检查都在内存中完成
+        with os.scandir(".") as it:
+            entries = {entry.name for entry in it}
+        
         # 检查必要的目录
         required_dirs = ["data", "logs", "backup"]
         for dir_name in required_dirs:
-            if not os.path.exists(dir_name):
-                os.makedirs(dir_name)
+            if dir_name not in entries:
+                os.makedirs(dir_name, exist_ok=True)
                 print(f"创建目录: {dir_name}")
         
         # 检查配置文件
-        if not os.path.exists("config.json"):
+        if "config.json" not in entries:
             print("警告: 配置文件不存在，将使用默认配置")
         
         # 检查环境变量文件
-        if not os.path.exists(".env"):
+        if ".env" not in entries:
             print("警告: .env文件不存在，某些功能可能无法正常工作")
-            if os.path.exists(".env.example"):
+            if ".env.example" in entries:
                 print("提示: 请复制.env.example为.env并配置相关参数")
         
         return True
@@ -6,11 +6,64 @@
 """
 
 from PyQt5.QtWidgets import (QWidget, QPushButton, QVBoxLayout, QHBoxLayout, 
-                             QDialog, QTextEdit, QLabel, QComboBox, QApplication)
-from PyQt5.QtCore import Qt, QPoint, pyqtSignal
+                             QDialog, QTextEdit, QLabel, QComboBox, QApplication,
+                             QMessageBox)
+from PyQt5.QtCore import Qt, QPoint, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont, QCursor
 import os
 from datetime import datetime
+from typing import Dict
+
+# 按钮图标路径
+_ICON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "resources", "icon1.svg")
+
+# 日志类型选项
+_LOG_TYPES = ("搬砖", "充电", "开会", "摸鱼")
+
+# 快速记录模板
+_TEMPLATES: Dict[str, str] = {
+    "开始搬砖": "今天又开始搬砖了，准备被压榨的任务：\n1. \n2. \n3. ",
+    "完成任务": "终于完成了一个任务：\n- 任务名称：\n- 完成时间：\n- 踩过的坑：\n- 血泪教训：",
+    "参加会议": "又被拉去开会：\n- 会议主题：\n- 受害人员：\n- 会议要点：\n- 后续被安排的活：",
+    "被迫学习": "被迫充电学习：\n- 学习内容：\n- 熬夜时长：\n- 痛苦收获：\n- 能否活用：",
+    "解决问题": "又踩坑了：\n- 问题描述：\n- 折腾过程：\n- 最终解决方案：\n- 是否真的解决了：",
+    "码代码": "码农日常：\n- 功能模块：\n- 进度情况：\n- 技术难点：\n- Bug情况：",
+    "写文档": "被迫写文档：\n- 文档类型：\n- 编写进度：\n- 主要内容：\n- 有人看吗：",
+    "调试Bug": "Debug血泪史：\n- 测试范围：\n- 发现的Bug：\n- 修复情况：\n- 还有多少坑："
+}
+_TEMPLATE_NAMES = tuple(_TEMPLATES)
+
+
+def _available_geometry(widget: QWidget):
+    """获取控件所在屏幕的可用区域（Qt 5.14之前退回QDesktopWidget）"""
+    screen = widget.screen() if hasattr(widget, "screen") else None
+    if screen is not None:
+        return screen.availableGeometry()
+    return QApplication.desktop().availableGeometry(widget)
+
+
+class _AIWorker(QThread):
+    """在后台线程执行耗时的AI调用"""
+    
+    finished_ok = pyqtSignal(str)  # 调用完成 (结果)
+    failed = pyqtSignal(str)  # 调用出错 (错误信息)
+    
+    # 运行中的线程，避免对话框关闭后线程对象在运行中被回收
+    _active = set()
+    
+    def __init__(self, func):
+        super().__init__()
+        self.func = func
+        _AIWorker._active.add(self)
+        self.finished.connect(lambda: _AIWorker._active.discard(self))
+    
+    def run(self):
+        """执行调用"""
+        try:
+            self.finished_ok.emit(self.func() or "")
+        except Exception as e:
+            self.failed.emit(str(e))
 
 
 class QuickAddButton(QWidget):
@@ -19,6 +72,9 @@ class QuickAddButton(QWidget):
     # 定义信号
     add_work_log_signal = pyqtSignal(str, str)
     
+    # 按钮图标，首次创建按钮时加载，之后的实例复用
+    _cached_icon = None
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -39,6 +95,16 @@ class QuickAddButton(QWidget):
         self.dragging = False
         self.drag_position = QPoint()
         self.click_start_pos = QPoint()
+        self._click_start_xy = (0, 0)
+        self._drag_screen_rect = None
+        
+        # 拖动结束后延迟保存位置，连续拖动只写入一次
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(1000)
+        self._save_timer.timeout.connect(self._do_save_position)
+        # 最近一次保存（或加载）的位置，位置未变化时不写入配置
+        self._last_saved_pos = (None, None)
         
         # 加载上次位置
         self.load_position()
@@ -68,10 +134,10 @@ class QuickAddButton(QWidget):
         """)
         
         # 设置图标（如果有）
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        icon_path = os.path.join(project_root, "resources", "icon1.svg")
-        if os.path.exists(icon_path):
-            self.add_button.setIcon(QIcon(icon_path))
+        if QuickAddButton._cached_icon is None and os.path.exists(_ICON_PATH):
+            QuickAddButton._cached_icon = QIcon(_ICON_PATH)
+        if QuickAddButton._cached_icon is not None:
+            self.add_button.setIcon(QuickAddButton._cached_icon)
             self.add_button.setText("")
             self.add_button.setIconSize(self.add_button.size() * 1.2)
         else:
@@ -105,8 +171,10 @@ class QuickAddButton(QWidget):
         """鼠标按下事件"""
         if event.button() == Qt.LeftButton:
             self.click_start_pos = event.globalPos()
+            self._click_start_xy = (self.click_start_pos.x(), self.click_start_pos.y())
             self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
             self.dragging = False  # 重置拖动状态
+            self._drag_screen_rect = None  # 屏幕区域在每次拖动开始时获取一次
             event.accept()
     
     def mouseMoveEvent(self, event):
@@ -114,8 +182,10 @@ class QuickAddButton(QWidget):
         if event.buttons() == Qt.LeftButton:
             # 检查是否开始拖动（移动距离超过阈值）
             if not self.dragging:
-                move_distance = (event.globalPos() - self.click_start_pos).manhattanLength()
-                if move_distance > 5:  # 拖动阈值
+                global_pos = event.globalPos()
+                dx = global_pos.x() - self._click_start_xy[0]
+                dy = global_pos.y() - self._click_start_xy[1]
+                if dx * dx + dy * dy > 25:  # 拖动阈值（5像素）
                     self.dragging = True
             
             if self.dragging:
@@ -123,7 +193,9 @@ class QuickAddButton(QWidget):
                 new_pos = event.globalPos() - self.drag_position
                 
                 # 获取屏幕尺寸
-                screen_rect = QApplication.desktop().availableGeometry(self)
+                if self._drag_screen_rect is None:
+                    self._drag_screen_rect = _available_geometry(self)
+                screen_rect = self._drag_screen_rect
                 
                 # 确保不超出屏幕边界
                 new_x = max(0, min(new_pos.x(), screen_rect.width() - self.width()))
@@ -147,15 +219,29 @@ class QuickAddButton(QWidget):
             event.accept()
     
     def save_position(self):
-        """保存按钮位置"""
+        """保存按钮位置（延迟写入，期间再次调用会重新计时）"""
+        self._save_timer.start()
+    
+    def closeEvent(self, event):
+        """关闭事件，写入尚未保存的位置"""
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self._do_save_position()
+        super().closeEvent(event)
+    
+    def _do_save_position(self):
+        """写入按钮位置"""
         # 尝试从应用程序获取ConfigManager
         config_manager = QApplication.instance().property("config_manager")
         if config_manager:
-            pos = self.pos()
-            settings = config_manager.get_settings()
-            settings["quick_add_button_x"] = pos.x()
-            settings["quick_add_button_y"] = pos.y()
-            config_manager.update_settings(settings)
+            pos = (self.pos().x(), self.pos().y())
+            if pos == self._last_saved_pos:
+                return
+            if config_manager.update_settings({
+                "quick_add_button_x": pos[0],
+                "quick_add_button_y": pos[1]
+            }):
+                self._last_saved_pos = pos
     
     def load_position(self):
         """加载按钮位置"""
@@ -170,16 +256,13 @@ class QuickAddButton(QWidget):
                 x = int(x)
                 y = int(y)
                 self.move(x, y)
-            else:
-                # 默认位置：屏幕右下角
-                screen_rect = QApplication.desktop().availableGeometry(self)
-                self.move(screen_rect.width() - self.width() - 20, 
-                          screen_rect.height() - self.height() - 20)
-        else:
-            # 默认位置：屏幕右下角
-            screen_rect = QApplication.desktop().availableGeometry(self)
-            self.move(screen_rect.width() - self.width() - 20, 
-                      screen_rect.height() - self.height() - 20)
+                self._last_saved_pos = (x, y)
+                return
+        
+        # 默认位置：屏幕右下角
+        screen_rect = _available_geometry(self)
+        self.move(screen_rect.width() - self.width() - 20, 
+                  screen_rect.height() - self.height() - 20)
 
 
 class QuickAddDialog(QDialog):
@@ -192,25 +275,19 @@ class QuickAddDialog(QDialog):
         self.setWindowFlags(Qt.Dialog | Qt.WindowStaysOnTopHint)
         self.resize(400, 300)  # 增加高度以容纳新按钮
         
-        # 获取配置管理器和AI生成器
+        # 获取配置管理器，AI生成器在首次使用时才创建
         self.config_manager = QApplication.instance().property("config_manager")
-        self.ai_generator = None
-        if self.config_manager:
-            ai_config = self.config_manager.get_ai_config()
-            if ai_config.get("enabled", False):
-                from ai_generator import AIReportGenerator
-                try:
-                    # 传递完整的配置字典而不是单独的参数
-                    self.ai_generator = AIReportGenerator(ai_config)
-                except Exception as e:
-                    print(f"初始化AI生成器失败: {e}")
+        self._ai_generator = None
+        self._ai_enabled = bool(
+            self.config_manager and self.config_manager.get_ai_config().get("enabled", False)
+        )
         
         # 初始化UI
         self.init_ui()
         
         # 移动到鼠标位置附近，确保不超出屏幕边界
         cursor_pos = QCursor.pos()
-        screen_rect = QApplication.desktop().availableGeometry(self)
+        screen_rect = _available_geometry(self)
         
         # 计算对话框位置，确保完全在屏幕内
         x = cursor_pos.x() - self.width() // 2
@@ -223,6 +300,19 @@ class QuickAddDialog(QDialog):
         
         self.move(x, y)
     
+    @property
+    def ai_generator(self):
+        """AI生成器（首次访问时创建）"""
+        if self._ai_generator is None and self._ai_enabled:
+            from ai_generator import AIReportGenerator
+            try:
+                # 传递完整的配置字典而不是单独的参数
+                self._ai_generator = AIReportGenerator(self.config_manager.get_ai_config())
+            except Exception as e:
+                print(f"初始化AI生成器失败: {e}")
+                self._ai_enabled = False
+        return self._ai_generator
+    
     def init_ui(self):
         """初始化UI"""
         layout = QVBoxLayout(self)
@@ -235,7 +325,7 @@ class QuickAddDialog(QDialog):
         type_layout.addWidget(QLabel("社畜分拣:"))
         
         self.type_combo = QComboBox()
-        self.type_combo.addItems(["搬砖", "充电", "开会", "摸鱼"])
+        self.type_combo.addItems(_LOG_TYPES)
         type_layout.addWidget(self.type_combo)
         
         top_layout.addLayout(type_layout)
@@ -246,8 +336,7 @@ class QuickAddDialog(QDialog):
         
         self.template_combo = QComboBox()
         self.template_combo.addItem("选择偷懒模板...")
-        self.template_combo.addItems(["开始搬砖", "完成任务", "参加会议", "被迫学习", 
-                                    "解决问题", "码代码", "写文档", "调试Bug"])
+        self.template_combo.addItems(_TEMPLATE_NAMES)
         template_layout.addWidget(self.template_combo)
         
         apply_template_btn = QPushButton("一键偷懒")
@@ -275,7 +364,7 @@ class QuickAddDialog(QDialog):
         # AI优化按钮
         self.optimize_btn = QPushButton("预览血泪")
         self.optimize_btn.clicked.connect(self.optimize_content)
-        self.optimize_btn.setEnabled(self.ai_generator is not None)
+        self.optimize_btn.setEnabled(self._ai_enabled)
         function_layout.addWidget(self.optimize_btn)
         
         layout.addLayout(function_layout)
@@ -304,20 +393,31 @@ class QuickAddDialog(QDialog):
         if template == "选择偷懒模板...":
             return
         
-        templates = {
-            "开始搬砖": "今天又开始搬砖了，准备被压榨的任务：\n1. \n2. \n3. ",
-            "完成任务": "终于完成了一个任务：\n- 任务名称：\n- 完成时间：\n- 踩过的坑：\n- 血泪教训：",
-            "参加会议": "又被拉去开会：\n- 会议主题：\n- 受害人员：\n- 会议要点：\n- 后续被安排的活：",
-            "被迫学习": "被迫充电学习：\n- 学习内容：\n- 熬夜时长：\n- 痛苦收获：\n- 能否活用：",
-            "解决问题": "又踩坑了：\n- 问题描述：\n- 折腾过程：\n- 最终解决方案：\n- 是否真的解决了：",
-            "码代码": "码农日常：\n- 功能模块：\n- 进度情况：\n- 技术难点：\n- Bug情况：",
-            "写文档": "被迫写文档：\n- 文档类型：\n- 编写进度：\n- 主要内容：\n- 有人看吗：",
-            "调试Bug": "Debug血泪史：\n- 测试范围：\n- 发现的Bug：\n- 修复情况：\n- 还有多少坑："
-        }
-        
-        content = templates.get(template, "")
+        content = _TEMPLATES.get(template, "")
         if content:
-            self.content_edit.setPlainText(content)
+            self._set_content(content)
+    
+    def _set_content(self, text: str):
+        """设置内容编辑框文本，文本相同时跳过以免重新排版"""
+        if self.content_edit.toPlainText() == text:
+            return
+        self.content_edit.setPlainText(text)
+    
+    def _start_worker(self, button, func, on_done, on_error):
+        """在后台线程执行func，执行期间禁用按钮"""
+        button.setEnabled(False)
+        button_text = button.text()
+        button.setText("处理中...")
+        
+        def restore():
+            button.setText(button_text)
+            button.setEnabled(True)
+        
+        worker = _AIWorker(func)
+        worker.finished_ok.connect(on_done)
+        worker.failed.connect(on_error)
+        worker.finished.connect(restore)
+        worker.start()
     
     def generate_daily_report(self):
         """生成今日工作日志"""
@@ -329,60 +429,71 @@ class QuickAddDialog(QDialog):
                 # 获取今日日期
                 today = datetime.now().strftime('%Y-%m-%d')
                 # 使用AI生成（如果可用）
-                use_ai = self.ai_generator is not None
-                report_content = report_gen.generate_daily_report(today, use_ai)
-                
-                if report_content:
-                    # 显示在内容编辑框中
-                    self.content_edit.setPlainText(f"今日工作总结：\n\n{report_content}")
-                else:
-                    from PyQt5.QtWidgets import QMessageBox
-                    QMessageBox.warning(self, "警告", "生成今日工作日志失败，可能没有足够的日志记录！")
+                use_ai = self._ai_enabled
+                self._start_worker(
+                    self.generate_daily_btn,
+                    lambda: report_gen.generate_daily_report(today, use_ai),
+                    self._on_daily_report_done,
+                    self._on_daily_report_error
+                )
             else:
-                from PyQt5.QtWidgets import QMessageBox
                 QMessageBox.warning(self, "警告", "配置管理器未初始化！")
         except Exception as e:
-            from PyQt5.QtWidgets import QMessageBox
-            QMessageBox.critical(self, "错误", f"生成今日工作日志时出错：{str(e)}")
+            self._on_daily_report_error(str(e))
+    
+    def _on_daily_report_done(self, report_content: str):
+        """今日工作日志生成完成"""
+        if report_content:
+            # 显示在内容编辑框中
+            self._set_content(f"今日工作总结：\n\n{report_content}")
+        else:
+            QMessageBox.warning(self, "警告", "生成今日工作日志失败，可能没有足够的日志记录！")
+    
+    def _on_daily_report_error(self, message: str):
+        """今日工作日志生成出错"""
+        QMessageBox.critical(self, "错误", f"生成今日工作日志时出错：{message}")
     
     def optimize_content(self):
         """AI优化日志内容"""
-        if not self.ai_generator:
-            from PyQt5.QtWidgets import QMessageBox
+        ai_generator = self.ai_generator
+        if not ai_generator:
             QMessageBox.warning(self, "警告", "AI功能未配置！")
             return
         
         current_content = self.content_edit.toPlainText()
         if not current_content:
-            from PyQt5.QtWidgets import QMessageBox
             QMessageBox.warning(self, "警告", "没有可优化的内容！")
             return
         
-        try:
-            # 使用enhance_report方法的polish选项来优化内容
-            optimized_content = self.ai_generator.enhance_report(current_content, "polish")
-            if optimized_content:
-                self.content_edit.setPlainText(optimized_content)
-                from PyQt5.QtWidgets import QMessageBox
-                QMessageBox.information(self, "成功", "内容优化完成！")
-            else:
-                from PyQt5.QtWidgets import QMessageBox
-                QMessageBox.warning(self, "失败", "内容优化失败！")
-        except Exception as e:
-            from PyQt5.QtWidgets import QMessageBox
-            QMessageBox.critical(self, "错误", f"优化过程中出现错误：{str(e)}")
+        # 使用enhance_report方法的polish选项来优化内容
+        self._start_worker(
+            self.optimize_btn,
+            lambda: ai_generator.enhance_report(current_content, "polish"),
+            self._on_optimize_done,
+            self._on_optimize_error
+        )
+    
+    def _on_optimize_done(self, optimized_content: str):
+        """AI优化完成"""
+        if optimized_content:
+            self._set_content(optimized_content)
+            QMessageBox.information(self, "成功", "内容优化完成！")
+        else:
+            QMessageBox.warning(self, "失败", "内容优化失败！")
+    
+    def _on_optimize_error(self, message: str):
+        """AI优化出错"""
+        QMessageBox.critical(self, "错误", f"优化过程中出现错误：{message}")
     
     def save_log(self):
         """保存工作日志"""
         try:
             content = self.content_edit.toPlainText().strip()
             if not content:
-                from PyQt5.QtWidgets import QMessageBox
                 QMessageBox.warning(self, "警告", "请输入日志内容！")
                 return
             
             if not self.config_manager:
-                from PyQt5.QtWidgets import QMessageBox
                 QMessageBox.warning(self, "警告", "配置管理器未初始化！")
                 return
             
@@ -399,14 +510,12 @@ class QuickAddDialog(QDialog):
             # 保存日志
             self.config_manager.add_work_log(log_data)
             
-            from PyQt5.QtWidgets import QMessageBox
             QMessageBox.information(self, "成功", "工作日志保存成功！")
             
             # 清空输入框
             self.content_edit.clear()
             
         except Exception as e:
-            from PyQt5.QtWidgets import QMessageBox
             QMessageBox.critical(self, "错误", f"保存日志时出错：{str(e)}")
 
 
@@ -5,11 +5,119 @@
 整合工作日志并生成各类报告
 """
 
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Mapping, Optional, Tuple
+import bisect
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
 import json
+import os
+import string
 from config_manager import ConfigManager
-from ai_generator import AIReportGenerator
+from ai_generator import AIReportGenerator, clear_openai_clients
+
+
+# 没有日志时的模板数据（只读，所有调用共享同一份）
+_EMPTY_FORMAT = MappingProxyType({
+    "completed_tasks": "暂无记录",
+    "ongoing_tasks": "暂无记录",
+    "tomorrow_plan": "待规划",
+    "achievements": "暂无记录",
+    "completed_projects": "暂无记录",
+    "next_week_plan": "待规划",
+    "monthly_achievements": "暂无记录",
+    "milestones": "暂无记录",
+    "next_month_goals": "待规划"
+})
+
+# 有日志时各输出项为空（或不来自日志）时的文本
+_FORMAT_DEFAULTS = {
+    "completed_tasks": "暂无完成事项",
+    "ongoing_tasks": "暂无进行中事项",
+    "tomorrow_plan": "根据今日进展制定明日计划",
+    "achievements": "暂无重要成果",
+    "completed_projects": "暂无完成项目",
+    "next_week_plan": "基于本周进展制定下周计划",
+    "monthly_achievements": "暂无月度成果",
+    "milestones": "暂无重要里程碑",
+    "next_month_goals": "基于本月总结制定下月目标"
+}
+
+
+class _LazyFormat(dict):
+    """模板渲染用数据（仅供_render_template使用），各输出项在模板首次引用时才拼接，模板未引用的项不产生字符串"""
+    
+    def __init__(self, buckets: Dict[str, List[str]]):
+        super().__init__()
+        self._buckets = buckets
+    
+    def __missing__(self, key: str) -> str:
+        lines = self._buckets.get(key)
+        value = "\n".join(lines) if lines else _FORMAT_DEFAULTS[key]
+        self[key] = value
+        return value
+
+
+_FORMATTER = string.Formatter()
+
+# 导出报告时单次write的最大字节数
+_EXPORT_CHUNK_SIZE = 1 << 20
+
+
+def write_report_file(filename: str, report_content: str) -> None:
+    """将报告写入文件并刷盘，写入失败时抛出OSError"""
+    # 一次编码后直接写入文件描述符，大文件按块写入并处理部分写入
+    data = memoryview(report_content.encode('utf-8'))
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        while data:
+            written = os.write(fd, data[:_EXPORT_CHUNK_SIZE])
+            data = data[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@lru_cache(maxsize=16)
+def _compile_template(template: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """将模板解析为(文本, 字段名)片段，含格式说明、转换或非简单字段名时返回None"""
+    segments = []
+    for literal, field, format_spec, conversion in _FORMATTER.parse(template):
+        if field is not None and (format_spec or conversion or not field.isidentifier()):
+            return None
+        segments.append((literal, field))
+    return tuple(segments)
+
+
+def _render_template(template: str, data: Mapping[str, str]) -> str:
+    """用预先解析的模板片段填充数据，复杂模板退回str.format_map"""
+    segments = _compile_template(template)
+    if segments is None:
+        return template.format_map(data)
+    return "".join(literal + str(data[field]) if field else literal
+                   for literal, field in segments)
+
+
+@lru_cache(maxsize=32)
+def _week_bounds(date_str: str) -> Tuple[str, str]:
+    """返回 YYYY-MM-DD 日期所在周的周一和周日"""
+    target = date.fromisoformat(date_str)
+    start_of_week = target - timedelta(days=target.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    return start_of_week.isoformat(), end_of_week.isoformat()
+
+
+@lru_cache(maxsize=32)
+def _month_bounds(date_str: str) -> Tuple[str, str]:
+    """返回 YYYY-MM-DD 日期所在月的第一天和最后一天"""
+    target = date.fromisoformat(date_str)
+    start_of_month = target.replace(day=1)
+    # 计算下个月第一天，然后减一天得到本月最后一天
+    if target.month == 12:
+        end_of_month = target.replace(year=target.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        end_of_month = target.replace(month=target.month + 1, day=1) - timedelta(days=1)
+    return start_of_month.isoformat(), end_of_month.isoformat()
 
 
 class ReportGenerator:
@@ -18,6 +126,9 @@ class ReportGenerator:
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         self.ai_generator = None
+        # 工作日志快照 (修订号, 按日期排序的日志, 对应的日期列表)，工作日志变化后重新获取；
+        # 三者作为一个元组整体替换，其他线程不会读到互不匹配的日志与日期列表
+        self._logs_snapshot: Optional[Tuple[int, List[Dict], List[str]]] = None
         self._init_ai_generator()
     
     def _init_ai_generator(self):
@@ -30,19 +141,23 @@ class ReportGenerator:
                 print(f"AI生成器初始化失败: {e}")
                 self.ai_generator = None
     
+    def _get_logs_cached(self) -> Tuple[List[Dict], List[str]]:
+        """获取按日期排序的工作日志快照及对应的日期列表，工作日志未变化时复用"""
+        revision = self.config_manager.get_work_logs_revision()
+        snapshot = self._logs_snapshot
+        if snapshot is None or snapshot[0] != revision:
+            logs = sorted(self.config_manager.get_work_logs(), key=lambda x: x.get('date', ''))
+            snapshot = (revision, logs, [log.get('date', '') for log in logs])
+            self._logs_snapshot = snapshot
+        return snapshot[1], snapshot[2]
+    
     def get_logs_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """根据日期范围获取工作日志"""
-        all_logs = self.config_manager.get_work_logs()
-        filtered_logs = []
-        
-        for log in all_logs:
-            log_date = log.get('date', '')
-            if start_date <= log_date <= end_date:
-                filtered_logs.append(log)
-        
-        # 按日期排序
-        filtered_logs.sort(key=lambda x: x.get('date', ''))
-        return filtered_logs
+        """根据日期范围获取工作日志（按日期排序）"""
+        all_logs, log_dates = self._get_logs_cached()
+        # 快照已按日期排序，二分查找范围边界
+        lo = bisect.bisect_left(log_dates, start_date)
+        hi = bisect.bisect_right(log_dates, end_date)
+        return all_logs[lo:hi]
     
     def get_logs_by_date(self, target_date: str) -> List[Dict]:
         """获取指定日期的工作日志"""
@@ -50,40 +165,51 @@ class ReportGenerator:
     
     def format_logs_for_template(self, logs: List[Dict]) -> Dict[str, str]:
         """格式化日志用于模板替换"""
+        data = self._template_data(logs)
+        return {key: data[key] for key in _FORMAT_DEFAULTS}
+    
+    def _template_data(self, logs: List[Dict]) -> Mapping[str, str]:
+        """生成模板渲染用的数据映射，各项在模板引用时才拼接（没有日志时返回共享的只读映射）"""
         if not logs:
-            return {
-                "completed_tasks": "暂无记录",
-                "ongoing_tasks": "暂无记录",
-                "tomorrow_plan": "待规划",
-                "achievements": "暂无记录",
-                "completed_projects": "暂无记录",
-                "next_week_plan": "待规划",
-                "monthly_achievements": "暂无记录",
-                "milestones": "暂无记录",
-                "next_month_goals": "待规划"
-            }
+            return _EMPTY_FORMAT
         
-        # 按优先级和类型分类
-        high_priority = [log for log in logs if log.get('priority') == '高']
-        completed = [log for log in logs if log.get('status') == '已完成']
-        in_progress = [log for log in logs if log.get('status') == '进行中']
+        # 单次遍历将日志分拣到各输出项
+        completed = []
+        ongoing = []
+        achievements = []
+        completed_projects = []
+        monthly_achievements = []
+        milestones = []
         
-        # 按类型分类
-        work_logs = [log for log in logs if log.get('type') == '工作']
-        meeting_logs = [log for log in logs if log.get('type') == '会议']
-        learning_logs = [log for log in logs if log.get('type') == '学习']
+        for log in logs:
+            get = log.get
+            line = f"- {get('content', '')}"
+            status = get('status')
+            log_type = get('type')
+            
+            if status == '已完成':
+                completed.append(line)
+                if log_type == '项目':
+                    completed_projects.append(line)
+            elif status == '进行中':
+                ongoing.append(line)
+            
+            if get('priority') == '高':
+                achievements.append(line)
+                if len(milestones) < 3:
+                    milestones.append(line)
+            
+            if log_type == '工作' and len(monthly_achievements) < 5:
+                monthly_achievements.append(line)
         
-        return {
-            "completed_tasks": "\n".join([f"- {log.get('content', '')}" for log in completed]) or "暂无完成事项",
-            "ongoing_tasks": "\n".join([f"- {log.get('content', '')}" for log in in_progress]) or "暂无进行中事项",
-            "tomorrow_plan": "根据今日进展制定明日计划",
-            "achievements": "\n".join([f"- {log.get('content', '')}" for log in high_priority]) or "暂无重要成果",
-            "completed_projects": "\n".join([f"- {log.get('content', '')}" for log in completed if log.get('type') == '项目']) or "暂无完成项目",
-            "next_week_plan": "基于本周进展制定下周计划",
-            "monthly_achievements": "\n".join([f"- {log.get('content', '')}" for log in work_logs[:5]]) or "暂无月度成果",
-            "milestones": "\n".join([f"- {log.get('content', '')}" for log in high_priority[:3]]) or "暂无重要里程碑",
-            "next_month_goals": "基于本月总结制定下月目标"
-        }
+        return _LazyFormat({
+            "completed_tasks": completed,
+            "ongoing_tasks": ongoing,
+            "achievements": achievements,
+            "completed_projects": completed_projects,
+            "monthly_achievements": monthly_achievements,
+            "milestones": milestones
+        })
     
     def generate_daily_report(self, target_date: str = None, use_ai: bool = False) -> Optional[str]:
         """生成日报"""
@@ -102,8 +228,8 @@ class ReportGenerator:
             templates = self.config_manager.get_templates()
             template = templates.get("daily", "今日工作总结：\n\n完成事项：\n{completed_tasks}\n\n进行中事项：\n{ongoing_tasks}\n\n明日计划：\n{tomorrow_plan}")
             
-            format_data = self.format_logs_for_template(logs)
-            return template.format(**format_data)
+            format_data = self._template_data(logs)
+            return _render_template(template, format_data)
     
     def generate_weekly_report(self, target_date: str = None, use_ai: bool = False) -> Optional[str]:
         """生成周报"""
@@ -111,12 +237,7 @@ class ReportGenerator:
             target_date = datetime.now().strftime('%Y-%m-%d')
         
         # 计算本周的开始和结束日期
-        target_dt = datetime.strptime(target_date, '%Y-%m-%d')
-        start_of_week = target_dt - timedelta(days=target_dt.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-        
-        start_date = start_of_week.strftime('%Y-%m-%d')
-        end_date = end_of_week.strftime('%Y-%m-%d')
+        start_date, end_date = _week_bounds(target_date)
         
         logs = self.get_logs_by_date_range(start_date, end_date)
         
@@ -130,8 +251,8 @@ class ReportGenerator:
             templates = self.config_manager.get_templates()
             template = templates.get("weekly", "本周工作总结：\n\n主要成果：\n{achievements}\n\n完成项目：\n{completed_projects}\n\n下周计划：\n{next_week_plan}")
             
-            format_data = self.format_logs_for_template(logs)
-            return template.format(**format_data)
+            format_data = self._template_data(logs)
+            return _render_template(template, format_data)
     
     def generate_monthly_report(self, target_date: str = None, use_ai: bool = False) -> Optional[str]:
         """生成月报"""
@@ -139,17 +260,7 @@ class ReportGenerator:
             target_date = datetime.now().strftime('%Y-%m-%d')
         
         # 计算本月的开始和结束日期
-        target_dt = datetime.strptime(target_date, '%Y-%m-%d')
-        start_of_month = target_dt.replace(day=1)
-        
-        # 计算下个月第一天，然后减一天得到本月最后一天
-        if target_dt.month == 12:
-            end_of_month = target_dt.replace(year=target_dt.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            end_of_month = target_dt.replace(month=target_dt.month + 1, day=1) - timedelta(days=1)
-        
-        start_date = start_of_month.strftime('%Y-%m-%d')
-        end_date = end_of_month.strftime('%Y-%m-%d')
+        start_date, end_date = _month_bounds(target_date)
         
         logs = self.get_logs_by_date_range(start_date, end_date)
         
@@ -163,8 +274,8 @@ class ReportGenerator:
             templates = self.config_manager.get_templates()
             template = templates.get("monthly", "本月工作总结：\n\n月度成果：\n{monthly_achievements}\n\n重要里程碑：\n{milestones}\n\n下月目标：\n{next_month_goals}")
             
-            format_data = self.format_logs_for_template(logs)
-            return template.format(**format_data)
+            format_data = self._template_data(logs)
+            return _render_template(template, format_data)
     
     def generate_smart_report_for_auto_submit(self, report_type: str = "daily") -> Optional[str]:
         """为自动提交生成智能报告"""
@@ -177,22 +288,15 @@ class ReportGenerator:
             else:
                 return self.generate_monthly_report(use_ai=False)
         
-        # 获取相应时间范围的日志
-        today = datetime.now().strftime('%Y-%m-%d')
+        # 获取相应时间范围的日志（截至今天）
+        today = date.today().isoformat()
         
         if report_type == "daily":
             logs = self.get_logs_by_date(today)
         elif report_type == "weekly":
-            target_dt = datetime.now()
-            start_of_week = target_dt - timedelta(days=target_dt.weekday())
-            end_date = today
-            start_date = start_of_week.strftime('%Y-%m-%d')
-            logs = self.get_logs_by_date_range(start_date, end_date)
+            logs = self.get_logs_by_date_range(_week_bounds(today)[0], today)
         else:
-            target_dt = datetime.now()
-            start_of_month = target_dt.replace(day=1)
-            start_date = start_of_month.strftime('%Y-%m-%d')
-            logs = self.get_logs_by_date_range(start_date, today)
+            logs = self.get_logs_by_date_range(_month_bounds(today)[0], today)
         
         return self.ai_generator.generate_smart_report(logs, report_type)
     
@@ -237,8 +341,7 @@ class ReportGenerator:
             filename = f"report_{timestamp}.txt"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(report_content)
+            write_report_file(filename, report_content)
             return True
         except Exception as e:
             print(f"导出报告失败: {e}")
@@ -248,24 +351,41 @@ class ReportGenerator:
         """获取报告统计信息"""
         history = self.config_manager.get_report_history()
         
-        stats = {
+        # 单次遍历统计各类型、生成方式的数量及最近生成时间
+        daily = weekly = monthly = ai_generated = template_generated = 0
+        latest = ""
+        for report in history:
+            get = report.get
+            report_type = get("type")
+            if report_type == "daily":
+                daily += 1
+            elif report_type == "weekly":
+                weekly += 1
+            elif report_type == "monthly":
+                monthly += 1
+            
+            method = get("method")
+            if method == "ai":
+                ai_generated += 1
+            elif method == "template":
+                template_generated += 1
+            
+            generated_at = get("generated_at", "")
+            if generated_at > latest:
+                latest = generated_at
+        
+        return {
             "total_reports": len(history),
-            "daily_reports": len([r for r in history if r.get("type") == "daily"]),
-            "weekly_reports": len([r for r in history if r.get("type") == "weekly"]),
-            "monthly_reports": len([r for r in history if r.get("type") == "monthly"]),
-            "ai_generated": len([r for r in history if r.get("method") == "ai"]),
-            "template_generated": len([r for r in history if r.get("method") == "template"])
+            "daily_reports": daily,
+            "weekly_reports": weekly,
+            "monthly_reports": monthly,
+            "ai_generated": ai_generated,
+            "template_generated": template_generated,
+            "latest_report_date": latest
         }
-        
-        # 最近生成时间
-        if history:
-            latest_report = max(history, key=lambda x: x.get("generated_at", ""))
-            stats["latest_report_date"] = latest_report.get("generated_at", "")
-        else:
-            stats["latest_report_date"] = ""
-        
-        return stats
     
     def refresh_ai_generator(self):
-        """刷新AI生成器配置"""
+        """刷新AI生成器配置（同时清空按旧配置缓存的共享客户端）"""
+        clear_openai_clients()
+        self.ai_generator = None
         self._init_ai_generator()
\ No newline at end of file
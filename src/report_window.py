@@ -5,6 +5,8 @@
 提供报告生成、查看、编辑和管理功能
 """
 
+import logging
+
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QLabel, QLineEdit, QTextEdit, QPushButton, QComboBox,
@@ -13,20 +15,87 @@ from PyQt5.QtWidgets import (
     QMessageBox, QInputDialog, QMenu, QAction, QFrame,
     QScrollArea, QFileDialog
 )
-from PyQt5.QtCore import Qt, QDate, QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import Qt, QDate, QThread, pyqtSignal, QTimer, QRegularExpression
 from PyQt5.QtGui import QFont, QColor, QPalette, QTextCharFormat, QSyntaxHighlighter
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List, Optional
 from config_manager import ConfigManager
-from report_generator import ReportGenerator
+from report_generator import ReportGenerator, write_report_file
 from ai_generator import AIReportGenerator
 
+logger = logging.getLogger(__name__)
+
+# 历史记录中时间戳的显示格式
+_TIMESTAMP_FMT = '%Y-%m-%d %H:%M'
+
+# 报告预览组件样式
+_PREVIEW_QSS = (
+    "QFrame {"
+    "    background-color: #fafafa;"
+    "    border: 1px solid #e0e0e0;"
+    "    border-radius: 8px;"
+    "}"
+    "QTextEdit {"
+    "    background-color: white;"
+    "    border: 1px solid #ddd;"
+    "    border-radius: 4px;"
+    "    padding: 10px;"
+    "}"
+    "QPushButton {"
+    "    background-color: #2196f3;"
+    "    color: white;"
+    "    border: none;"
+    "    padding: 8px 15px;"
+    "    border-radius: 4px;"
+    "    font-size: 12px;"
+    "}"
+    "QPushButton:hover {"
+    "    background-color: #1976d2;"
+    "}"
+)
+
+# 生成按钮样式
+_GENERATE_BTN_QSS = (
+    "QPushButton {"
+    "    background-color: #4caf50;"
+    "    color: white;"
+    "    border: none;"
+    "    padding: 15px 20px;"
+    "    border-radius: 8px;"
+    "    font-weight: bold;"
+    "    font-size: 14px;"
+    "}"
+    "QPushButton:hover {"
+    "    background-color: #45a049;"
+    "}"
+    "QPushButton:disabled {"
+    "    background-color: #cccccc;"
+    "}"
+)
+
+
+@lru_cache(maxsize=2048)
+def _format_ts(timestamp: str) -> str:
+    """将ISO格式的时间戳转换为更友好的显示格式，无法解析时原样返回"""
+    if not timestamp:
+        return ''
+    try:
+        return datetime.fromisoformat(timestamp).strftime(_TIMESTAMP_FMT)
+    except (ValueError, TypeError):
+        return timestamp
+
+
+def _report_timestamp(report: Dict) -> str:
+    """获取报告时间戳（优先使用generated_at，其次使用created_at）"""
+    return report.get('generated_at') or report.get('created_at') or ''
+
 
 class ReportGenerationThread(QThread):
     """报告生成线程"""
     
-    progress_updated = pyqtSignal(int)  # 进度更新
-    status_updated = pyqtSignal(str)   # 状态更新
+    progress_and_status = pyqtSignal(int, str)  # 进度和状态更新 (progress, status)
     generation_completed = pyqtSignal(str, str)  # 生成完成 (report_type, content)
     generation_failed = pyqtSignal(str)  # 生成失败
     
@@ -38,31 +107,37 @@ class ReportGenerationThread(QThread):
         self.start_date = start_date
         self.end_date = end_date
         self.use_ai = use_ai
+        self._last_progress = None
+        self._last_status = None
+    
+    def _emit_progress(self, value: int, status: str):
+        """发出进度和状态，进度变化不足5%且状态未变时不发出"""
+        if (status == self._last_status and self._last_progress is not None
+                and value - self._last_progress < 5):
+            return
+        self._last_progress = value
+        self._last_status = status
+        self.progress_and_status.emit(value, status)
     
     def run(self):
         """运行报告生成"""
         try:
-            self.status_updated.emit("正在准备生成报告...")
-            self.progress_updated.emit(10)
+            self._emit_progress(10, "正在准备生成报告...")
             
             if self.report_type == "daily":
-                self.status_updated.emit("正在生成日报...")
-                self.progress_updated.emit(30)
+                self._emit_progress(30, "正在生成日报...")
                 content = self.report_generator.generate_daily_report(use_ai=self.use_ai)
             
             elif self.report_type == "weekly":
-                self.status_updated.emit("正在生成周报...")
-                self.progress_updated.emit(30)
+                self._emit_progress(30, "正在生成周报...")
                 content = self.report_generator.generate_weekly_report(use_ai=self.use_ai)
             
             elif self.report_type == "monthly":
-                self.status_updated.emit("正在生成月报...")
-                self.progress_updated.emit(30)
+                self._emit_progress(30, "正在生成月报...")
                 content = self.report_generator.generate_monthly_report(use_ai=self.use_ai)
             
             elif self.report_type == "custom":
-                self.status_updated.emit("正在生成自定义报告...")
-                self.progress_updated.emit(30)
+                self._emit_progress(30, "正在生成自定义报告...")
                 content = self.report_generator.generate_custom_report(
                     self.start_date, self.end_date, use_ai=self.use_ai
                 )
@@ -70,14 +145,12 @@ class ReportGenerationThread(QThread):
             else:
                 raise ValueError(f"不支持的报告类型: {self.report_type}")
             
-            self.progress_updated.emit(80)
-            self.status_updated.emit("正在保存报告...")
+            self._emit_progress(80, "正在保存报告...")
             
             if content:
                 # 保存报告
                 self.report_generator.save_report(content, self.report_type)
-                self.progress_updated.emit(100)
-                self.status_updated.emit("报告生成完成！")
+                self._emit_progress(100, "报告生成完成！")
                 self.generation_completed.emit(self.report_type, content)
             else:
                 self.generation_failed.emit("报告内容为空")
@@ -86,59 +159,144 @@ class ReportGenerationThread(QThread):
             self.generation_failed.emit(str(e))
 
 
+class AIOperationThread(QThread):
+    """AI处理报告线程（润色、扩展、精简）"""
+    
+    operation_completed = pyqtSignal(str, str)  # 处理完成 (operation, content)
+    operation_failed = pyqtSignal(str, str)  # 处理失败 (operation, error_message)
+    
+    def __init__(self, ai_generator: AIReportGenerator, operation: str, content: str):
+        super().__init__()
+        self.ai_generator = ai_generator
+        self.operation = operation
+        self.content = content
+    
+    def run(self):
+        """调用AI生成器的对应方法"""
+        try:
+            result = getattr(self.ai_generator, self.operation)(self.content)
+            self.operation_completed.emit(self.operation, result or "")
+        except Exception as e:
+            self.operation_failed.emit(self.operation, str(e))
+
+
+class HistoryLoadThread(QThread):
+    """报告历史加载线程"""
+    
+    history_loaded = pyqtSignal(list)  # 加载完成 (history)
+    
+    def __init__(self, config_manager: ConfigManager):
+        super().__init__()
+        self.config_manager = config_manager
+    
+    def run(self):
+        """读取报告历史"""
+        try:
+            history = self.config_manager.get_report_history()
+        except Exception:
+            logger.exception("加载报告历史失败")
+            history = []
+        self.history_loaded.emit(history)
+
+
+class ReportExportThread(QThread):
+    """报告导出线程"""
+    
+    export_completed = pyqtSignal(str)  # 导出完成 (file_path)
+    export_failed = pyqtSignal(str)  # 导出失败
+    
+    def __init__(self, content: str, file_path: str):
+        super().__init__()
+        self.content = content
+        self.file_path = file_path
+    
+    def run(self):
+        """写入报告文件"""
+        try:
+            write_report_file(self.file_path, self.content)
+            self.export_completed.emit(self.file_path)
+        except Exception as e:
+            self.export_failed.emit(str(e))
+
+
 class MarkdownHighlighter(QSyntaxHighlighter):
     """Markdown语法高亮"""
     
+    # 各高亮规则的起始字符，文本块不含其中任何一个时无需匹配
+    _MARKERS = frozenset('#*`[')
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setup_highlighting_rules()
     
+    @staticmethod
+    def _compile(pattern: str) -> QRegularExpression:
+        """编译高亮正则（Qt内置PCRE2，optimize()立即完成JIT编译）"""
+        regex = QRegularExpression(
+            pattern,
+            QRegularExpression.MultilineOption | QRegularExpression.UseUnicodePropertiesOption
+        )
+        regex.optimize()
+        return regex
+    
     def setup_highlighting_rules(self):
-        """设置高亮规则"""
+        """设置高亮规则（正则在此预编译，逐块高亮时直接复用）"""
         self.highlighting_rules = []
         
+        # 各规则使用取反字符类代替.*?，匹配失败时不回溯，长行上也保持线性耗时
+        
         # 标题格式
         header_format = QTextCharFormat()
         header_format.setForeground(QColor("#1976d2"))
         header_format.setFontWeight(QFont.Bold)
-        self.highlighting_rules.append((r'^#{1,6}\s.*$', header_format))
+        self.highlighting_rules.append((self._compile(r'^#{1,6}[ \t][^\n]*'), header_format))
         
         # 粗体
         bold_format = QTextCharFormat()
         bold_format.setFontWeight(QFont.Bold)
-        self.highlighting_rules.append((r'\*\*.*?\*\*', bold_format))
+        self.highlighting_rules.append((self._compile(r'\*\*[^*]+\*\*'), bold_format))
         
         # 斜体
         italic_format = QTextCharFormat()
         italic_format.setFontItalic(True)
-        self.highlighting_rules.append((r'\*.*?\*', italic_format))
+        self.highlighting_rules.append((self._compile(r'\*[^*\n]+\*'), italic_format))
         
         # 代码
         code_format = QTextCharFormat()
         code_format.setForeground(QColor("#d32f2f"))
         code_format.setBackground(QColor("#f5f5f5"))
-        self.highlighting_rules.append((r'`.*?`', code_format))
+        self.highlighting_rules.append((self._compile(r'`[^`\n]+`'), code_format))
         
         # 链接
         link_format = QTextCharFormat()
         link_format.setForeground(QColor("#1976d2"))
         link_format.setUnderlineStyle(QTextCharFormat.SingleUnderline)
-        self.highlighting_rules.append((r'\[.*?\]\(.*?\)', link_format))
+        self.highlighting_rules.append((self._compile(r'\[[^\[\]\n]*\]\([^()\n]*\)'), link_format))
     
     def highlightBlock(self, text):
         """高亮文本块"""
-        import re
+        if self._MARKERS.isdisjoint(text):
+            return
         
-        for pattern, format in self.highlighting_rules:
-            for match in re.finditer(pattern, text, re.MULTILINE):
-                start = match.start()
-                length = match.end() - start
-                self.setFormat(start, length, format)
+        set_format = self.setFormat
+        for regex, format in self.highlighting_rules:
+            matches = regex.globalMatch(text)
+            while matches.hasNext():
+                match = matches.next()
+                set_format(match.capturedStart(), match.capturedLength(), format)
 
 
 class ReportPreviewWidget(QFrame):
     """报告预览组件"""
     
+    # 报告类型显示名称
+    _TYPE_NAMES = {
+        "daily": "今日血泪",
+        "weekly": "本周受苦",
+        "monthly": "本月折磨",
+        "custom": "自定义痛苦"
+    }
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setup_ui()
@@ -181,6 +339,13 @@ class ReportPreviewWidget(QFrame):
         # 添加Markdown高亮
         self.highlighter = MarkdownHighlighter(self.content_edit.document())
         
+        # 编辑时防抖更新字数
+        self._word_count_timer = QTimer(self)
+        self._word_count_timer.setSingleShot(True)
+        self._word_count_timer.setInterval(200)
+        self._word_count_timer.timeout.connect(self.update_word_count)
+        self.content_edit.textChanged.connect(self._word_count_timer.start)
+        
         layout.addWidget(self.content_edit)
         
         # 操作按钮
@@ -212,34 +377,12 @@ class ReportPreviewWidget(QFrame):
         layout.addLayout(button_layout)
         
         self.original_content = ""
+        self.export_thread = None
     
     def setup_style(self):
         """设置样式"""
         self.setFrameStyle(QFrame.Box)
-        self.setStyleSheet(
-            "QFrame {"
-            "    background-color: #fafafa;"
-            "    border: 1px solid #e0e0e0;"
-            "    border-radius: 8px;"
-            "}"
-            "QTextEdit {"
-            "    background-color: white;"
-            "    border: 1px solid #ddd;"
-            "    border-radius: 4px;"
-            "    padding: 10px;"
-            "}"
-            "QPushButton {"
-            "    background-color: #2196f3;"
-            "    color: white;"
-            "    border: none;"
-            "    padding: 8px 15px;"
-            "    border-radius: 4px;"
-            "    font-size: 12px;"
-            "}"
-            "QPushButton:hover {"
-            "    background-color: #1976d2;"
-            "}"
-        )
+        self.setStyleSheet(_PREVIEW_QSS)
     
     def set_report(self, report_type: str, content: str, date_range: str = ""):
         """设置报告内容"""
@@ -247,18 +390,12 @@ class ReportPreviewWidget(QFrame):
         self.original_content = content
         
         # 更新信息
-        type_names = {
-            "daily": "今日血泪",
-            "weekly": "本周受苦", 
-            "monthly": "本月折磨",
-            "custom": "自定义痛苦"
-        }
-        self.type_label.setText(f"类型: {type_names.get(report_type, report_type)}")
+        self.type_label.setText(f"类型: {self._TYPE_NAMES.get(report_type, report_type)}")
         self.date_label.setText(f"日期: {date_range or datetime.now().strftime('%Y-%m-%d')}")
-        self.word_count_label.setText(f"字数: {len(content)}")
         
         # 设置内容
         self.content_edit.setPlainText(content)
+        self.update_word_count()
         self.content_edit.setReadOnly(True)
         
         # 重置按钮状态
@@ -266,6 +403,12 @@ class ReportPreviewWidget(QFrame):
         self.save_btn.setVisible(False)
         self.cancel_btn.setVisible(False)
     
+    def update_word_count(self):
+        """更新字数（文档字符数已由Qt维护，减去末尾的段落分隔符）"""
+        self._word_count_timer.stop()
+        count = self.content_edit.document().characterCount() - 1
+        self.word_count_label.setText(f"字数: {count}")
+    
     def enable_editing(self):
         """启用编辑模式"""
         self.content_edit.setReadOnly(False)
@@ -281,7 +424,7 @@ class ReportPreviewWidget(QFrame):
         self.original_content = new_content
         
         # 更新字数
-        self.word_count_label.setText(f"字数: {len(new_content)}")
+        self.update_word_count()
         
         self.content_edit.setReadOnly(True)
         self.edit_btn.setVisible(True)
@@ -321,12 +464,22 @@ class ReportPreviewWidget(QFrame):
         )
         
         if file_path:
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                QMessageBox.information(self, "成功", f"报告已导出到：{file_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"导出失败：{str(e)}")
+            # 在后台线程写入文件，避免大报告导出时阻塞界面
+            self.export_btn.setEnabled(False)
+            self.export_thread = ReportExportThread(content, file_path)
+            self.export_thread.export_completed.connect(self.on_export_completed)
+            self.export_thread.export_failed.connect(self.on_export_failed)
+            self.export_thread.start()
+    
+    def on_export_completed(self, file_path: str):
+        """导出完成处理"""
+        self.export_btn.setEnabled(True)
+        QMessageBox.information(self, "成功", f"报告已导出到：{file_path}")
+    
+    def on_export_failed(self, error_message: str):
+        """导出失败处理"""
+        self.export_btn.setEnabled(True)
+        QMessageBox.critical(self, "错误", f"导出失败：{error_message}")
     
     def get_content(self) -> str:
         """获取当前内容"""
@@ -336,6 +489,13 @@ class ReportPreviewWidget(QFrame):
 class ReportWindow(QWidget):
     """报告窗口"""
     
+    # AI处理方法 -> (结果报告类型, 内容描述, 结果描述, 操作名称)
+    _AI_OPERATIONS = {
+        "enhance_report": ("enhanced", "可润色的血泪", "血泪润色", "润色"),
+        "expand_report": ("expanded", "可扩展的痛苦", "痛苦扩展", "扩展"),
+        "summarize_report": ("summarized", "可精简的血泪", "血泪精简", "精简")
+    }
+    
     def __init__(self, config_manager: ConfigManager, report_generator: ReportGenerator = None, parent=None):
         super().__init__(parent)
         self.config_manager = config_manager
@@ -349,6 +509,10 @@ class ReportWindow(QWidget):
             self.ai_generator = None
         
         self.generation_thread = None
+        self.ai_thread = None
+        self.history_thread = None
+        # 历史加载中又请求刷新时，加载完成后再重新加载一次
+        self._history_reload_pending = False
         
         self.setup_ui()
         self.setup_connections()
@@ -456,23 +620,7 @@ class ReportWindow(QWidget):
         
         # 生成按钮
         self.generate_btn = QPushButton("🚀 生成血泪史")
-        self.generate_btn.setStyleSheet(
-            "QPushButton {"
-            "    background-color: #4caf50;"
-            "    color: white;"
-            "    border: none;"
-            "    padding: 15px 20px;"
-            "    border-radius: 8px;"
-            "    font-weight: bold;"
-            "    font-size: 14px;"
-            "}"
-            "QPushButton:hover {"
-            "    background-color: #45a049;"
-            "}"
-            "QPushButton:disabled {"
-            "    background-color: #cccccc;"
-            "}"
-        )
+        self.generate_btn.setStyleSheet(_GENERATE_BTN_QSS)
         layout.addWidget(self.generate_btn)
         
         # 进度显示
@@ -640,8 +788,9 @@ class ReportWindow(QWidget):
         )
         
         # 连接信号
-        self.generation_thread.progress_updated.connect(self.update_progress)
-        self.generation_thread.status_updated.connect(self.update_status)
+        self.generation_thread.progress_and_status.connect(
+            self.update_progress_and_status, Qt.QueuedConnection
+        )
         self.generation_thread.generation_completed.connect(self.on_generation_completed)
         self.generation_thread.generation_failed.connect(self.on_generation_failed)
         
@@ -653,12 +802,9 @@ class ReportWindow(QWidget):
         # 启动线程
         self.generation_thread.start()
     
-    def update_progress(self, value: int):
-        """更新进度"""
+    def update_progress_and_status(self, value: int, message: str):
+        """同时更新进度和状态"""
         self.progress_bar.setValue(value)
-    
-    def update_status(self, message: str):
-        """更新状态"""
         self.status_label.setText(message)
     
     def on_generation_completed(self, report_type: str, content: str):
@@ -694,75 +840,66 @@ class ReportWindow(QWidget):
     
     def enhance_report(self):
         """润色报告"""
-        if not self.ai_generator:
-            QMessageBox.warning(self, "警告", "AI润色师未配置！")
-            return
-        
-        current_content = self.preview_tab.get_content()
-        if not current_content:
-            QMessageBox.warning(self, "警告", "没有可润色的血泪内容！")
-            return
-        
-        try:
-            enhanced_content = self.ai_generator.enhance_report(current_content)
-            if enhanced_content:
-                self.preview_tab.set_report("enhanced", enhanced_content)
-                QMessageBox.information(self, "成功", "血泪润色完成！")
-            else:
-                QMessageBox.warning(self, "失败", "血泪润色失败！")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"润色过程中出现错误：{str(e)}")
+        self._run_ai_operation("enhance_report")
     
     def expand_report(self):
         """扩展报告"""
-        if not self.ai_generator:
-            QMessageBox.warning(self, "警告", "AI润色师未配置！")
-            return
-        
-        current_content = self.preview_tab.get_content()
-        if not current_content:
-            QMessageBox.warning(self, "警告", "没有可扩展的痛苦内容！")
-            return
-        
-        try:
-            expanded_content = self.ai_generator.expand_report(current_content)
-            if expanded_content:
-                self.preview_tab.set_report("expanded", expanded_content)
-                QMessageBox.information(self, "成功", "痛苦扩展完成！")
-            else:
-                QMessageBox.warning(self, "失败", "痛苦扩展失败！")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"扩展过程中出现错误：{str(e)}")
+        self._run_ai_operation("expand_report")
     
     def summarize_report(self):
         """精简报告"""
+        self._run_ai_operation("summarize_report")
+    
+    def _set_ai_buttons_enabled(self, enabled: bool):
+        """启用/禁用AI增强按钮"""
+        self.enhance_btn.setEnabled(enabled)
+        self.expand_btn.setEnabled(enabled)
+        self.summarize_btn.setEnabled(enabled)
+    
+    def _run_ai_operation(self, operation: str):
+        """在后台线程执行AI处理，避免网络请求阻塞界面"""
         if not self.ai_generator:
             QMessageBox.warning(self, "警告", "AI润色师未配置！")
             return
         
+        if self.ai_thread and self.ai_thread.isRunning():
+            QMessageBox.warning(self, "警告", "AI润色师正在处理中，请稍候...")
+            return
+        
         current_content = self.preview_tab.get_content()
         if not current_content:
-            QMessageBox.warning(self, "警告", "没有可精简的血泪内容！")
+            QMessageBox.warning(self, "警告", f"没有{self._AI_OPERATIONS[operation][1]}内容！")
             return
         
-        try:
-            summarized_content = self.ai_generator.summarize_report(current_content)
-            if summarized_content:
-                self.preview_tab.set_report("summarized", summarized_content)
-                QMessageBox.information(self, "成功", "血泪精简完成！")
-            else:
-                QMessageBox.warning(self, "失败", "血泪精简失败！")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"精简过程中出现错误：{str(e)}")
+        self.ai_thread = AIOperationThread(self.ai_generator, operation, current_content)
+        self.ai_thread.operation_completed.connect(self.on_ai_operation_completed, Qt.QueuedConnection)
+        self.ai_thread.operation_failed.connect(self.on_ai_operation_failed, Qt.QueuedConnection)
+        
+        self._set_ai_buttons_enabled(False)
+        self.ai_thread.start()
+    
+    def on_ai_operation_completed(self, operation: str, content: str):
+        """AI处理完成"""
+        self._set_ai_buttons_enabled(True)
+        report_type, _, result_name, _ = self._AI_OPERATIONS[operation]
+        
+        if content:
+            self.preview_tab.set_report(report_type, content)
+            QMessageBox.information(self, "成功", f"{result_name}完成！")
+        else:
+            QMessageBox.warning(self, "失败", f"{result_name}失败！")
+    
+    def on_ai_operation_failed(self, operation: str, error_message: str):
+        """AI处理出错"""
+        self._set_ai_buttons_enabled(True)
+        action_name = self._AI_OPERATIONS[operation][3]
+        QMessageBox.critical(self, "错误", f"{action_name}过程中出现错误：{error_message}")
     
     def load_templates(self):
         """加载模板"""
         templates = self.config_manager.get_report_templates()
         self.template_combo.clear()
-        self.template_combo.addItem("选择血泪模板...")
-        
-        for template_name in templates.keys():
-            self.template_combo.addItem(template_name)
+        self.template_combo.addItems(["选择血泪模板...", *templates])
     
     def apply_template(self):
         """应用模板"""
@@ -799,33 +936,48 @@ class ReportWindow(QWidget):
                 QMessageBox.critical(self, "错误", "血泪模板保存失败！")
     
     def load_report_history(self):
-        """加载报告历史"""
-        history = self.config_manager.get_report_history()
-        self.history_list.clear()
+        """加载报告历史（在后台线程读取，完成后填充列表）"""
+        if self.history_thread and self.history_thread.isRunning():
+            self._history_reload_pending = True
+            return
+        
+        self._history_reload_pending = False
+        self.history_thread = HistoryLoadThread(self.config_manager)
+        self.history_thread.history_loaded.connect(self._on_history_loaded)
+        self.history_thread.start()
+    
+    def _on_history_loaded(self, history: list):
+        """报告历史加载完成处理"""
+        if self._history_reload_pending:
+            # 加载期间历史已变化，丢弃本次结果并重新加载
+            self.history_thread.wait()
+            self.load_report_history()
+            return
         
         # 按时间倒序排列（优先使用generated_at，其次使用created_at）
-        sorted_history = sorted(history, key=lambda x: x.get('generated_at', x.get('created_at', '')), reverse=True)
-        
-        for report in sorted_history:
-            # 获取时间戳（优先使用generated_at，其次使用created_at）
-            timestamp = report.get('generated_at', report.get('created_at', ''))
-            if timestamp:
-                # 如果是ISO格式的时间戳，转换为更友好的格式
-                try:
-                    dt = datetime.fromisoformat(timestamp)
-                    timestamp = dt.strftime('%Y-%m-%d %H:%M')
-                except (ValueError, TypeError):
-                    pass
-            else:
-                timestamp = '未知时间'
+        # 时间戳每条只取一次，ISO格式字符串可直接按字典序比较
+        decorated = [(_report_timestamp(report), report) for report in history]
+        decorated.sort(key=itemgetter(0), reverse=True)
+        
+        # 填充期间暂停重绘和信号，全部添加后统一刷新一次
+        history_list = self.history_list
+        history_list.setUpdatesEnabled(False)
+        history_list.blockSignals(True)
+        try:
+            history_list.clear()
+            for timestamp, report in decorated:
+                timestamp = _format_ts(timestamp) or '未知时间'
                 
-            item_text = f"{report.get('type', '未知')} - {timestamp}"
-            if report.get('title'):
-                item_text = f"{report.get('title')} ({item_text})"
-            
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, report)
-            self.history_list.addItem(item)
+                item_text = f"{report.get('type', '未知')} - {timestamp}"
+                if report.get('title'):
+                    item_text = f"{report.get('title')} ({item_text})"
+                
+                item = QListWidgetItem(item_text)
+                item.setData(Qt.UserRole, report)
+                history_list.addItem(item)
+        finally:
+            history_list.blockSignals(False)
+            history_list.setUpdatesEnabled(True)
     
     def load_history_report(self, item: QListWidgetItem):
         """加载历史报告"""
@@ -834,15 +986,7 @@ class ReportWindow(QWidget):
             content = report_data.get('content', '')
             report_type = report_data.get('type', 'unknown')
             
-            # 获取时间戳（优先使用generated_at，其次使用created_at）
-            timestamp = report_data.get('generated_at', report_data.get('created_at', ''))
-            if timestamp:
-                # 如果是ISO格式的时间戳，转换为更友好的格式
-                try:
-                    dt = datetime.fromisoformat(timestamp)
-                    timestamp = dt.strftime('%Y-%m-%d %H:%M')
-                except (ValueError, TypeError):
-                    pass
+            timestamp = _format_ts(_report_timestamp(report_data))
             
             self.preview_tab.set_report(report_type, content, timestamp)
             self.tab_widget.setCurrentIndex(0)  # 切换到预览选项卡
@@ -903,4 +1047,11 @@ class ReportWindow(QWidget):
             self.generation_thread.terminate()
             self.generation_thread.wait()
         
+        if self.ai_thread and self.ai_thread.isRunning():
+            self.ai_thread.terminate()
+            self.ai_thread.wait()
+        
+        if self.history_thread and self.history_thread.isRunning():
+            self.history_thread.wait()
+        
         event.accept()
\ No newline at end of file
@@ -195,7 +195,7 @@ class TimerManager(QObject):
         if not date_str:
             target_date = datetime.now()
         else:
-            target_date = datetime.strptime(date_str, "%Y-%m-%d")
+            target_date = datetime.fromisoformat(date_str)
         
         weekday = target_date.strftime("%A")
         weekday_map = {
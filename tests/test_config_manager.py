@@ -9,12 +9,16 @@ import unittest
 import tempfile
 import os
 import json
+import shutil
+import gc
+import weakref
 from unittest.mock import patch, MagicMock
 
 # 添加src目录到路径
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
+import config_manager as config_manager_module
 from config_manager import ConfigManager
 
 
@@ -150,5 +154,182 @@ class TestConfigManager(unittest.TestCase):
             self.assertIn("ai_config", config_manager.config)
 
 
+
+class TestConfigManagerJournals(unittest.TestCase):
+    """工作日志与报告历史日志文件测试类"""
+    
+    def setUp(self):
+        """测试前的设置"""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_config_file = os.path.join(self.test_dir, "test_config.json")
+    
+    def tearDown(self):
+        """测试后的清理"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def _write_config(self, config):
+        """写入测试配置文件"""
+        with open(self.test_config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+    
+    def _read_config(self):
+        """读取配置文件内容"""
+        with open(self.test_config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def test_migrate_duplicate_ids(self):
+        """测试迁移含重复id的旧版配置时不丢失记录"""
+        self._write_config({
+            "work_logs": [
+                {"id": 3, "content": "A"},
+                {"id": 2, "content": "B"},
+                {"id": 3, "content": "C"}
+            ]
+        })
+        
+        config_manager = ConfigManager(self.test_config_file)
+        logs = config_manager.get_work_logs()
+        
+        self.assertEqual([log["content"] for log in logs], ["A", "B", "C"])
+        ids = [log["id"] for log in logs]
+        self.assertEqual(len(set(ids)), 3)
+        
+        # 迁移后的配置文件不再包含列表，重新加载仍能得到全部记录
+        config_manager.flush()
+        self.assertNotIn("work_logs", self._read_config())
+        
+        reloaded = ConfigManager(self.test_config_file)
+        self.assertEqual([log["content"] for log in reloaded.get_work_logs()], ["A", "B", "C"])
+        
+        # 新记录的id不与已有记录重复
+        reloaded.add_work_log({"content": "D"})
+        self.assertNotIn(reloaded.get_work_logs()[-1]["id"], ids)
+    
+    def test_configs_in_same_directory(self):
+        """测试同目录下的两个配置文件使用各自的日志文件"""
+        other_config_file = os.path.join(self.test_dir, "other_config.json")
+        config_manager = ConfigManager(self.test_config_file, save_delay=0)
+        other_manager = ConfigManager(other_config_file, save_delay=0)
+        
+        config_manager.add_work_log({"content": "A"})
+        other_manager.add_work_log({"content": "B"})
+        other_manager.add_report_history({"type": "daily", "content": "R"})
+        
+        reloaded = ConfigManager(self.test_config_file, save_delay=0)
+        other_reloaded = ConfigManager(other_config_file, save_delay=0)
+        self.assertEqual([log["content"] for log in reloaded.get_work_logs()], ["A"])
+        self.assertEqual(reloaded.get_report_history(), [])
+        self.assertEqual([log["content"] for log in other_reloaded.get_work_logs()], ["B"])
+        self.assertEqual([r["content"] for r in other_reloaded.get_report_history()], ["R"])
+    
+    def test_save_debounce(self):
+        """测试时间窗口内的连续修改合并写盘"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=60)
+        
+        # 窗口内首次修改立即写盘
+        self.assertTrue(config_manager.update_settings({"first": 1}))
+        self.assertEqual(self._read_config()["settings"]["first"], 1)
+        
+        # 之后的修改只标记为未保存
+        self.assertTrue(config_manager.update_settings({"second": 2}))
+        self.assertNotIn("second", self._read_config()["settings"])
+        self.assertTrue(config_manager._dirty)
+        
+        # flush立即写入并取消定时器
+        self.assertTrue(config_manager.flush())
+        self.assertFalse(config_manager._dirty)
+        self.assertIsNone(config_manager._save_timer)
+        self.assertEqual(self._read_config()["settings"]["second"], 2)
+    
+    def test_save_without_debounce(self):
+        """测试save_delay为0时每次修改立即写盘"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=0)
+        
+        config_manager.update_settings({"first": 1})
+        config_manager.update_settings({"second": 2})
+        
+        self.assertIsNone(config_manager._save_timer)
+        self.assertFalse(config_manager._dirty)
+        settings = self._read_config()["settings"]
+        self.assertEqual((settings["first"], settings["second"]), (1, 2))
+    
+    def test_save_error_returned(self):
+        """测试写盘失败时返回False"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=60)
+        self.assertTrue(config_manager.update_settings({"first": 1}))
+        self.assertTrue(config_manager.update_settings({"second": 2}))
+        
+        with patch('config_manager._atomic_write', side_effect=OSError("disk full")):
+            # 合并写入失败后，下一次修改立即写盘并返回失败
+            self.assertFalse(config_manager.flush())
+            self.assertFalse(config_manager.update_settings({"third": 3}))
+        
+        self.assertTrue(config_manager.update_settings({"fourth": 4}))
+        self.assertEqual(self._read_config()["settings"]["third"], 3)
+        config_manager.flush()
+    
+    def test_flush_on_exit(self):
+        """测试退出时写入未保存的修改，且不延长实例生命周期"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=60)
+        config_manager.update_settings({"first": 1})
+        config_manager.update_settings({"second": 2})
+        
+        config_manager_module._flush_all()
+        self.assertEqual(self._read_config()["settings"]["second"], 2)
+        
+        ref = weakref.ref(config_manager)
+        del config_manager
+        gc.collect()
+        self.assertIsNone(ref())
+    
+    def test_journal_replay(self):
+        """测试重新加载时按日志重放新增、修改和删除"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=0)
+        for content in ("A", "B", "C"):
+            config_manager.add_work_log({"content": content})
+        a, b, c = (log["id"] for log in config_manager.get_work_logs())
+        
+        config_manager.update_work_log(b, {"content": "B2"})
+        config_manager.delete_work_log(a)
+        config_manager.add_report_history({"type": "daily", "content": "R"})
+        
+        reloaded = ConfigManager(self.test_config_file, save_delay=0)
+        self.assertEqual(
+            [(log["id"], log["content"]) for log in reloaded.get_work_logs()],
+            [(b, "B2"), (c, "C")]
+        )
+        self.assertEqual([r["content"] for r in reloaded.get_report_history()], ["R"])
+    
+    def test_id_index_after_delete(self):
+        """测试删除记录后按id仍能定位到正确的记录"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=0)
+        for content in ("A", "B", "C", "D"):
+            config_manager.add_work_log({"content": content})
+        ids = [log["id"] for log in config_manager.get_work_logs()]
+        
+        self.assertTrue(config_manager.delete_work_log(ids[1]))
+        self.assertFalse(config_manager.delete_work_log(ids[1]))
+        self.assertTrue(config_manager.update_work_log(ids[3], {"content": "D2"}))
+        
+        # 外部代码就地重排列表后索引自动重建
+        config_manager.get_work_logs().reverse()
+        self.assertTrue(config_manager.update_work_log(ids[0], {"content": "A2"}))
+        
+        contents = {log["id"]: log["content"] for log in config_manager.get_work_logs()}
+        self.assertEqual(contents, {ids[0]: "A2", ids[2]: "C", ids[3]: "D2"})
+    
+    def test_ids_not_reused(self):
+        """测试删除记录后新记录不复用id"""
+        config_manager = ConfigManager(self.test_config_file, save_delay=0)
+        config_manager.add_work_log({"content": "A"})
+        config_manager.add_work_log({"content": "B"})
+        last_id = config_manager.get_work_logs()[-1]["id"]
+        
+        config_manager.delete_work_log(last_id)
+        config_manager.add_work_log({"content": "C"})
+        
+        self.assertGreater(config_manager.get_work_logs()[-1]["id"], last_id)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file